@@ -0,0 +1,63 @@
+"""TuckShop Pro: a Flask app for running a small shop's stock, sales and credit.
+
+create_app() builds the app from the modules in this package:
+
+    config, extensions        settings from the environment; db and login_manager
+    models, queries, schema   tables, read paths, schema upgrades and rebuilds
+    caching, security         in-process caches; password hashing
+    auth, admin, inventory,   blueprints, one per area of the site
+    loans, rates, pages
+    metrics, profiling        request instrumentation (metrics also serves /metrics)
+    jobs, exports, assets     reminder queue, CSV downloads, fingerprinted static files
+    commands                  the `flask` maintenance commands
+"""
+import os
+
+from flask import Flask
+
+from .admin import admin_bp
+from .assets import init_assets
+from .auth import auth_bp
+from .commands import init_commands
+from .config import basedir, database_url, engine_options
+from .extensions import db, login_manager
+from .inventory import inventory_bp
+from .loans import loans_bp
+from .metrics import metrics_bp, metrics_request_end, metrics_request_start
+from .pages import pages_bp
+from .profiling import PROFILE_REQUESTS, profile_request_end, profile_request_start
+from .rates import rates_bp
+
+BLUEPRINTS = (auth_bp, admin_bp, inventory_bp, loans_bp, rates_bp, pages_bp, metrics_bp)
+
+# --- APPLICATION FACTORY ---
+def create_app(config=None):
+    """Build a configured app. Does not touch the database; see schema.init_schema()."""
+    # Templates, static files and instance/ live at the repository root.
+    app = Flask(__name__, root_path=basedir, instance_path=os.path.join(basedir, 'instance'))
+
+    # --- CONFIGURATION ---
+    app.config['SECRET_KEY'] = os.environ.get('FLASK_SECRET_KEY')
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_url()
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config['SQLALCHEMY_DATABASE_URI'])
+    if config:
+        app.config.update(config)
+
+    db.init_app(app)
+    login_manager.init_app(app)
+    for blueprint in BLUEPRINTS:
+        app.register_blueprint(blueprint)
+
+    # --- REQUEST HOOKS ---
+    # after_request hooks run in reverse order, so the profiler's total
+    # covers the metrics bookkeeping too.
+    if PROFILE_REQUESTS:
+        app.before_request(profile_request_start)
+        app.after_request(profile_request_end)
+    app.before_request(metrics_request_start)
+    app.after_request(metrics_request_end)
+
+    init_commands(app)
+    init_assets(app)
+    return app
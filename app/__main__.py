@@ -0,0 +1,8 @@
+"""Local development only (`python -m app`); production goes through wsgi.py (see gunicorn.conf.py)."""
+from . import create_app
+from .schema import init_schema
+
+app = create_app()
+with app.app_context():
+    init_schema()
+app.run(host='0.0.0.0', debug=True)
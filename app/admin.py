@@ -0,0 +1,102 @@
+"""The master admin panel."""
+from functools import wraps
+
+from flask import Blueprint, flash, jsonify, redirect, render_template, request, session, url_for
+
+from .caching import admin_stats_cache, fragment_cache, page_cache, user_cache
+from .config import ADMIN_PASSWORD, ADMIN_USERNAME
+from .extensions import db
+from .models import DataVersion, User, user_version_key
+from .profiling import PROFILE_REQUESTS, SLOW_REQUEST_MS, route_stats
+from .queries import admin_stats, page_size, product_page, shop_loans, user_page
+
+admin_bp = Blueprint('admin', __name__)
+
+def admin_required(f):
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if not session.get('is_admin'):
+            flash("Admin access required.", "danger")
+            return redirect(url_for('admin.admin_login'))
+        return f(*args, **kwargs)
+    return decorated_function
+
+@admin_bp.route('/admin/login', methods=['GET', 'POST'])
+def admin_login():
+    if request.method == 'POST':
+        if request.form.get('username') == ADMIN_USERNAME and \
+           request.form.get('password') == ADMIN_PASSWORD:
+            session['is_admin'] = True
+            flash("Welcome to the Master Admin Panel", "success")
+            return redirect(url_for('admin.admin_dashboard'))
+        flash("Invalid Admin Credentials", "danger")
+    return render_template('admin_login.html')
+
+@admin_bp.route('/admin/logout')
+def admin_logout():
+    session.pop('is_admin', None)
+    return redirect(url_for('admin.admin_login'))
+
+@admin_bp.route('/admin/dashboard')
+@admin_required
+def admin_dashboard():
+    return render_template('admin_dashboard.html', stats=admin_stats())
+
+@admin_bp.route('/admin/cache_stats')
+@admin_required
+def admin_cache_stats():
+    """Size and hit/miss counters of this worker's in-process caches."""
+    return jsonify({'users': user_cache.stats(), 'admin_stats': admin_stats_cache.stats(),
+                    'pages': page_cache.stats(), 'fragments': fragment_cache.stats()})
+
+@admin_bp.route('/admin/slow_routes')
+@admin_required
+def admin_slow_routes():
+    """Per-route latency recorded by this worker (needs PROFILE_REQUESTS=1)."""
+    return render_template('admin_slow_routes.html', routes=route_stats.slowest(),
+                           enabled=PROFILE_REQUESTS, threshold=SLOW_REQUEST_MS)
+
+@admin_bp.route('/admin/users')
+@admin_required
+def admin_users():
+    # Query users and count their related items
+    page = user_page(request.args.get('cursor'), page_size())
+    return render_template('admin_users.html', users=page.items, next_cursor=page.next_cursor)
+
+@admin_bp.route('/admin/user/<int:user_id>')
+@admin_required
+def admin_user_detail(user_id):
+    user = User.query.get_or_404(user_id)
+    per_page = page_size()
+    products_page = product_page(user.id, request.args.get('products_cursor'), per_page)
+    loans_page = shop_loans(user.id, request.args.get('loans_cursor'), per_page)
+    return render_template('admin_user_detail.html', user=user,
+                           products=products_page.items, products_next=products_page.next_cursor,
+                           loans=loans_page.items, loans_next=loans_page.next_cursor)
+
+@admin_bp.route('/admin/toggle_user/<int:user_id>')
+@admin_required
+def toggle_user(user_id):
+    user = User.query.get_or_404(user_id)
+    # Prevent admin from deactivating themselves if they are in the User table
+    user.is_active = not user.is_active
+    DataVersion.bump(user_version_key(user.id))
+    db.session.commit()
+    user_cache.invalidate(user.id)
+    status = "activated" if user.is_active else "deactivated"
+    flash(f"User {user.username} has been {status}.", "info")
+    return redirect(url_for('admin.admin_users'))
+
+@admin_bp.route('/admin/delete_user/<int:user_id>', methods=['POST'])
+@admin_required
+def delete_user(user_id):
+    user = User.query.get_or_404(user_id)
+    
+    # This will also delete their products/loans if you have cascade="all, delete-orphan"
+    db.session.delete(user)
+    DataVersion.bump(user_version_key(user_id))
+    db.session.commit()
+    user_cache.invalidate(user_id)
+    
+    flash(f"User {user.username} and all their data have been permanently deleted.", "warning")
+    return redirect(url_for('admin.admin_users'))
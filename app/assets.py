@@ -0,0 +1,112 @@
+"""Fingerprinted, pre-compressed static assets."""
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+
+from flask import request, send_from_directory
+
+# `flask --app app build-assets` writes minified, content-hashed copies of
+# static/css and static/images (plus .gz, and .br when the optional brotli
+# package is installed) to static/dist/ with a manifest. When the manifest
+# exists, url_for('static', filename='css/style.css') resolves to the hashed
+# copy, which is served pre-compressed with a one-year immutable cache.
+ASSET_DIRS = ('css', 'images', 'js')
+ASSET_DIST = 'dist'
+ASSET_MANIFEST = 'manifest.json'
+COMPRESSIBLE_ASSETS = ('.css', '.js', '.svg', '.json')
+ASSET_MAX_AGE = 365 * 24 * 3600
+
+try:
+    import brotli
+except ImportError:  # optional: only gzip copies are built without it
+    brotli = None
+
+_CSS_STRINGS = r'"(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\''
+_CSS_COMMENTS = re.compile(r'(' + _CSS_STRINGS + r')|/\*.*?\*/', re.S)
+
+def minify_css(source):
+    """Strip comments and redundant whitespace, leaving string literals alone."""
+    source = _CSS_COMMENTS.sub(lambda m: m.group(1) or '', source)
+    # re.split with a capture group puts the string literals at odd indexes.
+    parts = re.split(r'(' + _CSS_STRINGS + r')', source)
+    return ''.join(part if i % 2 else _squeeze_css(part) for i, part in enumerate(parts)).strip()
+
+def _squeeze_css(chunk):
+    chunk = re.sub(r'\s+', ' ', chunk)
+    chunk = re.sub(r' ?([{};,]) ?', r'\1', chunk)
+    chunk = re.sub(r': ', ':', chunk)
+    return chunk.replace(';}', '}')
+
+def build_assets(static_folder):
+    """Write hashed (and compressed) copies of the static assets; return the manifest."""
+    dist = os.path.join(static_folder, ASSET_DIST)
+    os.makedirs(dist, exist_ok=True)
+    manifest = {}
+    for folder in ASSET_DIRS:
+        root = os.path.join(static_folder, folder)
+        for dirpath, _, filenames in os.walk(root):
+            for filename in sorted(filenames):
+                source_path = os.path.join(dirpath, filename)
+                logical = os.path.relpath(source_path, static_folder).replace(os.sep, '/')
+                with open(source_path, 'rb') as f:
+                    data = f.read()
+                if filename.endswith('.css'):
+                    data = minify_css(data.decode('utf-8')).encode('utf-8')
+                digest = hashlib.sha256(data).hexdigest()[:12]
+                stem, ext = os.path.splitext(logical)
+                hashed = f'{stem}.{digest}{ext}'
+                target = os.path.join(dist, *hashed.split('/'))
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                with open(target, 'wb') as f:
+                    f.write(data)
+                if ext in COMPRESSIBLE_ASSETS:
+                    with open(target + '.gz', 'wb') as f:
+                        f.write(gzip.compress(data, compresslevel=9, mtime=0))
+                    if brotli is not None:
+                        with open(target + '.br', 'wb') as f:
+                            f.write(brotli.compress(data, quality=11))
+                manifest[logical] = f'{ASSET_DIST}/{hashed}'
+    with open(os.path.join(dist, ASSET_MANIFEST), 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest
+
+def init_assets(app):
+    """Point url_for('static') at the hashed copies, if they have been built."""
+    manifest_path = os.path.join(app.static_folder, ASSET_DIST, ASSET_MANIFEST)
+    if not os.path.exists(manifest_path):
+        return
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+    app.extensions['asset_manifest'] = manifest
+
+    @app.url_defaults
+    def hashed_static_url(endpoint, values):
+        if endpoint == 'static' and values.get('filename') in manifest:
+            values['filename'] = manifest[values['filename']]
+
+    plain_static = app.view_functions['static']
+
+    def static(filename):
+        if not filename.startswith(ASSET_DIST + '/'):
+            return plain_static(filename=filename)
+        directory = app.static_folder
+        accepted = request.accept_encodings
+        mimetype = mimetypes.guess_type(filename)[0]
+        for encoding, suffix in (('br', '.br'), ('gzip', '.gz')):
+            if accepted[encoding] and os.path.exists(os.path.join(directory, filename + suffix)):
+                response = send_from_directory(directory, filename + suffix, mimetype=mimetype)
+                response.headers['Content-Encoding'] = encoding
+                break
+        else:
+            response = send_from_directory(directory, filename)
+        response.vary.add('Accept-Encoding')
+        response.cache_control.no_cache = None
+        response.cache_control.public = True
+        response.cache_control.max_age = ASSET_MAX_AGE
+        response.cache_control.immutable = True
+        return response
+
+    app.view_functions['static'] = static
@@ -0,0 +1,152 @@
+"""Shopkeeper accounts: registration, login and the per-request user loader."""
+import threading
+import time
+from datetime import datetime, timedelta
+
+from flask import Blueprint, flash, redirect, render_template, request, url_for
+from flask_login import current_user, login_required, login_user, logout_user
+from sqlalchemy.orm import make_transient_to_detached
+
+from .caching import user_cache
+from .config import env_int
+from .extensions import db, login_manager
+from .models import User
+from .queries import changed_users
+from .security import HashingBusy, password_needs_rehash
+
+auth_bp = Blueprint('auth', __name__)
+
+# How often each process polls for users changed by other processes.
+USER_CHECK_SECONDS = env_int('USER_CHECK_SECONDS', 2)
+# updated_at is stored to the second and stamped before commit, so look a
+# little further back than the previous poll.
+USER_CHECK_OVERLAP = timedelta(seconds=2)
+_user_check = {'due': 0.0, 'since': None}
+_user_check_lock = threading.Lock()
+
+@login_manager.user_loader
+def load_user(user_id):
+    """Rebuild current_user from user_cache, only querying on a miss.
+
+    The cache holds plain column values rather than ORM objects (which are
+    bound to the request's session); each request gets its own detached User.
+    Users changed by another worker process are evicted by
+    evict_changed_users() within USER_CHECK_SECONDS.
+    """
+    user_id = int(user_id)
+    evict_changed_users()
+    row = user_cache.get(user_id)
+    if row is None:
+        user = db.session.get(User, user_id)
+        if user is None:
+            return None
+        row = {c.key: getattr(user, c.key) for c in User.__table__.columns}
+        user_cache.set(user_id, row)
+        return user
+    user = User(**row)
+    make_transient_to_detached(user)
+    return user
+
+def evict_changed_users():
+    """Drop cached users that any process changed since this process last looked.
+
+    Costs one indexed query per USER_CHECK_SECONDS per process; every other
+    request is served from user_cache without touching the database.
+    """
+    with _user_check_lock:
+        now = time.monotonic()
+        if now < _user_check['due']:
+            return
+        _user_check['due'] = now + USER_CHECK_SECONDS
+        since, _user_check['since'] = _user_check['since'], datetime.utcnow()
+    if since is None:
+        return  # first request in this process: nothing cached yet
+    for user_id in changed_users(since - USER_CHECK_OVERLAP):
+        user_cache.invalidate(user_id)
+
+@auth_bp.route('/register', methods=['GET', 'POST'])
+def register():
+    if request.method == 'POST':
+        username = request.form.get('username')
+        email = request.form.get('email')
+        password = request.form.get('password')
+
+        # Check if user already exists
+        existing_user = User.query.filter((User.username == username) | (User.email == email)).first()
+        
+        if existing_user:
+            flash('Username or Email already registered!', 'error')
+            return redirect(url_for('auth.register'))
+
+        # Create new user and hash the password
+        new_user = User(username=username, email=email)
+        try:
+            new_user.set_password(password)
+        except HashingBusy:
+            flash("The server is busy right now. Please try again in a moment.", "error")
+            return render_template('register.html'), 503
+        
+        db.session.add(new_user)
+        db.session.commit()
+        # request.form.get('remember') returns 'on' if checked, else None
+        remember_me = True if request.form.get('remember') else False
+
+        flash('Registration successful! Please login.', 'success')
+        return redirect(url_for('auth.login'))
+
+    return render_template('register.html')
+
+@auth_bp.route('/login', methods=['GET', 'POST'])
+def login():
+    # If user is already logged in, send them to dashboard
+    if current_user.is_authenticated:
+        return redirect(url_for('inventory.dashboard'))
+
+    if request.method == 'POST':
+        # Get data from the form
+        identity = request.form.get('login_identity')  # Matches the 'name' in your HTML
+        password = request.form.get('password')
+        
+        # Check if "Remember Me" was checked (returns 'on' if checked, else None)
+        remember_me = True if request.form.get('remember') else False
+
+        # 1. Look for user by Username OR Email
+        user = User.query.filter((User.username == identity) | (User.email == identity)).first()
+
+        # 2. Verify password
+        try:
+            password_ok = bool(user) and user.check_password(password)
+        except HashingBusy:
+            flash("The server is busy right now. Please try again in a moment.", "danger")
+            return render_template('login.html'), 503
+
+        if password_ok:
+            if not user.is_active:
+                flash("Your account has been deactivated by the admin.", "danger")
+                return redirect(url_for('auth.login'))
+            # Upgrade hashes made with an older algorithm/cost while we
+            # still have the plain password at hand.
+            if password_needs_rehash(user.password_hash):
+                try:
+                    user.set_password(password)
+                    db.session.commit()
+                except HashingBusy:
+                    pass  # Not urgent; it will be retried on the next login.
+            # The 'remember' parameter creates a long-term cookie in the browser
+            login_user(user, remember=remember_me)
+            
+            flash("Welcome back to TuckShop Pro!", "success")
+            
+            # Redirect to the page they were trying to access, or dashboard
+            next_page = request.args.get('next')
+            return redirect(next_page) if next_page else redirect(url_for('inventory.dashboard'))
+        else:
+            flash("Login failed. Please check your username/email and password.", "danger")
+
+    return render_template('login.html')
+@auth_bp.route('/logout')
+@login_required
+def logout():
+    logout_user()
+    flash('You have been logged out.', 'info')
+    return redirect(url_for('auth.login'))
@@ -0,0 +1,144 @@
+"""In-process caches and the helpers that render through them."""
+import gzip
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app, render_template, request, session
+from flask_login import current_user
+from markupsafe import Markup
+from sqlalchemy import event
+
+from .config import env_int
+from .extensions import db
+
+class TTLCache:
+    """A small thread-safe in-process cache with per-entry TTL and LRU eviction.
+
+    Each worker process keeps its own copy, so entries are only as fresh as
+    the TTL across workers; writes made through this process invalidate
+    immediately (see invalidate_on_commit()).
+    """
+
+    def __init__(self, ttl, maxsize=1024):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def get_or_set(self, key, compute):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = compute()
+            self.set(key, value)
+        return value
+
+    def invalidate(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            return {'size': len(self._data), 'maxsize': self.maxsize, 'ttl': self.ttl,
+                    'hits': self.hits, 'misses': self.misses}
+
+_MISSING = object()
+
+def invalidate_on_commit(cache, models):
+    """Clear cache after any commit that wrote to one of models.
+
+    Catches both unit-of-work changes (session.add/delete/dirty objects) and
+    bulk ORM UPDATE/DELETE statements such as Product.sell()'s.
+    """
+    models = tuple(models)
+
+    @event.listens_for(db.session, 'after_flush')
+    def _mark_flush(session, flush_context):
+        if any(isinstance(obj, models) for obj in (*session.new, *session.dirty, *session.deleted)):
+            session.info.setdefault('dirty_caches', set()).add(id(cache))
+
+    @event.listens_for(db.session, 'do_orm_execute')
+    def _mark_bulk(state):
+        if (state.is_update or state.is_delete or state.is_insert) and any(
+                m.class_ in models for m in state.all_mappers):
+            state.session.info.setdefault('dirty_caches', set()).add(id(cache))
+
+    @event.listens_for(db.session, 'after_commit')
+    def _clear(session):
+        dirty = session.info.get('dirty_caches')
+        if dirty and id(cache) in dirty:
+            dirty.discard(id(cache))
+            cache.clear()
+
+    @event.listens_for(db.session, 'after_rollback')
+    def _forget(session):
+        session.info.pop('dirty_caches', None)
+
+# Global figures for the admin dashboard; see admin_stats().
+admin_stats_cache = TTLCache(ttl=env_int('ADMIN_STATS_TTL', 30), maxsize=1)
+
+# Rendered HTML. Whole pages that only depend on the template and the login
+# state (about, rates, clinic) live in page_cache as (html, gzipped html);
+# data-backed fragments live in fragment_cache keyed by the values they show,
+# so a write elsewhere changes the key instead of needing an invalidation.
+page_cache = TTLCache(ttl=env_int('PAGE_CACHE_TTL', 3600), maxsize=env_int('PAGE_CACHE_SIZE', 32))
+fragment_cache = TTLCache(ttl=env_int('PAGE_CACHE_TTL', 3600),
+                          maxsize=env_int('FRAGMENT_CACHE_SIZE', 10000))
+
+def cached_page(template):
+    """render_template(template) through page_cache, gzipped when the client accepts it."""
+    if session.get('_flashes'):
+        # Pending flash messages are part of the page; render them fresh.
+        return render_template(template)
+
+    def render():
+        html = render_template(template).encode('utf-8')
+        return html, gzip.compress(html, compresslevel=6, mtime=0)
+
+    html, gzipped = page_cache.get_or_set((template, current_user.is_authenticated), render)
+    if request.accept_encodings['gzip']:
+        response = current_app.response_class(gzipped, mimetype='text/html')
+        response.headers['Content-Encoding'] = 'gzip'
+    else:
+        response = current_app.response_class(html, mimetype='text/html')
+    response.vary.add('Accept-Encoding')
+    return response
+
+def cached_fragment(key, template, **context):
+    """Render template to Markup once per key (which must change whenever the output would).
+
+    Context values are callables, so only a cache miss pays for their queries.
+    """
+    return fragment_cache.get_or_set(
+        key, lambda: Markup(render_template(template, **{k: v() for k, v in context.items()})))
+
+# Users behind authenticated requests, keyed by id; see load_user().
+# toggle_user/delete_user/set_password bump the user's DataVersion in the
+# same transaction and evict it locally; every other worker process polls
+# for bumped users (see auth.evict_changed_users()) and evicts them too.
+user_cache = TTLCache(ttl=env_int('USER_CACHE_TTL', 60), maxsize=env_int('USER_CACHE_SIZE', 10000))
@@ -0,0 +1,139 @@
+"""Maintenance commands (`flask --app app <command>`)."""
+import os
+import time
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+
+from .assets import brotli, build_assets
+from .extensions import db
+from .jobs import run_queued_jobs
+from .models import Customer, DailySales, Product, Rate
+from .queries import collect_query_plans, full_scans
+from .schema import (add_missing_columns, backfill_customer_ledger, create_missing_indexes,
+                     ensure_product_search, import_rates_json, init_schema, rebuild_daily_rollup,
+                     rebuild_product_search, reconcile_stock_counters, unbalanced_customers)
+
+@click.command('init-db')
+@with_appcontext
+def init_db_command():
+    """Create missing tables, columns and indexes and fill new rollups."""
+    init_schema()
+    print("Database schema is up to date.")
+
+@click.command('create-indexes')
+@with_appcontext
+def create_indexes_command():
+    """Add the query indexes declared on the models to an existing database."""
+    created = create_missing_indexes()
+    for name in created:
+        print(f"Created index {name}")
+    if not created:
+        print("All indexes already present.")
+
+@click.command('import-rates')
+@with_appcontext
+@click.argument('json_path', required=False)
+def import_rates_command(json_path):
+    """One-time import of static/rates.json (or JSON_PATH) into the rate table."""
+    json_path = json_path or os.path.join(current_app.root_path, 'static', 'rates.json')
+    if Rate.query.first() is not None and not click.confirm("The rate table already has rows. Import anyway?"):
+        return
+    print(f"Imported {import_rates_json(json_path)} rates from {json_path}.")
+
+@click.command('rebuild-search-index')
+@with_appcontext
+def rebuild_search_index_command():
+    """Recreate the product name search index from the product table."""
+    if db.engine.dialect.name != 'sqlite':
+        raise click.ClickException("The FTS5 search index only exists on SQLite.")
+    ensure_product_search()
+    rebuild_product_search()
+    print("Rebuilt product search index.")
+
+@click.command('backfill-daily-sales')
+@with_appcontext
+def backfill_daily_sales_command():
+    """Rebuild the per-product daily sales rollup from the sale table."""
+    rebuild_daily_rollup()
+    print(f"Rebuilt {DailySales.query.count()} daily rollup rows.")
+
+@click.command('reconcile-stock')
+@with_appcontext
+def reconcile_stock_command():
+    """Add any missing counter columns and rebuild them from the sale table."""
+    for name in add_missing_columns():
+        print(f"Added column {name}")
+    reconcile_stock_counters()
+    print(f"Reconciled sales counters for {Product.query.count()} products.")
+
+@click.command('reconcile-ledger')
+@with_appcontext
+def reconcile_ledger_command():
+    """Book any loans missing from the customer ledger, rebuild balances and check them."""
+    for name in add_missing_columns():
+        print(f"Added column {name}")
+    booked = backfill_customer_ledger()
+    print(f"Booked {booked} loans; reconciled {Customer.query.count()} customer balances.")
+    mismatched = unbalanced_customers()
+    if mismatched:
+        for customer, balance, open_amount in mismatched:
+            print(f"MISMATCH: customer {customer.id} ({customer.phone}) balance {balance!r}, "
+                  f"unpaid loans {open_amount!r}")
+        raise SystemExit(1)
+    print("OK: every balance matches its unpaid loans; paid-up customers are at exactly 0.")
+
+@click.command('check-query-plans')
+@with_appcontext
+def check_query_plans_command():
+    """Fail if any hot-path query falls back to a full table scan."""
+    if db.engine.dialect.name != 'sqlite':
+        raise click.ClickException("check-query-plans needs a SQLite database.")
+    plans = collect_query_plans()
+    for statement, lines in plans:
+        print(' '.join(statement.split()))
+        for line in lines:
+            print(f"    {line}")
+    offenders = full_scans(plans)
+    if offenders:
+        for statement, line in offenders:
+            print(f"FULL SCAN: {line}\n    in: {' '.join(statement.split())}")
+        raise SystemExit(1)
+    print(f"OK: {len(plans)} statements, no full table scans.")
+
+@click.command('run-reminder-worker')
+@with_appcontext
+@click.option('--once', is_flag=True, help='Exit when the queue is empty.')
+@click.option('--interval', default=2.0, help='Seconds between polls of an empty queue.')
+def run_reminder_worker_command(once, interval):
+    """Process queued reminder jobs outside the web workers."""
+    app = current_app._get_current_object()
+    while True:
+        ran = run_queued_jobs(app)
+        if ran:
+            print(f"Ran {ran} job(s).")
+        if once:
+            return
+        time.sleep(interval)
+
+@click.command('build-assets')
+@with_appcontext
+def build_assets_command():
+    """Minify, fingerprint and pre-compress static assets into static/dist."""
+    manifest = build_assets(current_app.static_folder)
+    for logical, hashed in sorted(manifest.items()):
+        print(f"{logical} -> {hashed}")
+    if brotli is None:
+        print("brotli is not installed; built gzip copies only.")
+
+COMMANDS = [
+    init_db_command, create_indexes_command, import_rates_command, rebuild_search_index_command,
+    backfill_daily_sales_command, reconcile_stock_command, reconcile_ledger_command,
+    check_query_plans_command, run_reminder_worker_command, build_assets_command,
+]
+
+def init_commands(app):
+    """Make the maintenance commands available as `flask <command>`."""
+    for command in COMMANDS:
+        app.cli.add_command(command)
@@ -0,0 +1,90 @@
+"""Settings read from the environment (and .env) when the package is imported."""
+import os
+import sqlite3
+
+from dotenv import load_dotenv
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+load_dotenv()
+
+# The repository root, which holds templates/, static/ and instance/.
+basedir = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+
+# --- DATABASE ENGINE CONFIGURATION ---
+# DATABASE_URL picks the database; anything unset falls back to the local
+# instance/shop.db SQLite file. Pool and pragma knobs are read from the
+# environment so they can be tuned per deployment without code changes.
+def env_int(name, default):
+    value = os.environ.get(name)
+    return int(value) if value not in (None, '') else default
+
+def database_url():
+    url = os.environ.get('DATABASE_URL')
+    if not url:
+        os.makedirs(os.path.join(basedir, 'instance'), exist_ok=True)
+        return 'sqlite:///' + os.path.join(basedir, 'instance', 'shop.db')
+    if url.startswith('postgres://'):
+        # Heroku-style URLs; SQLAlchemy only accepts the postgresql:// scheme.
+        url = 'postgresql://' + url[len('postgres://'):]
+    return url
+
+def engine_options(url):
+    if url.startswith('sqlite'):
+        options = {
+            # sqlite3's own lock wait, in seconds; busy_timeout below covers
+            # the same ground at the SQLite level once connected.
+            'connect_args': {'timeout': env_int('SQLITE_BUSY_TIMEOUT_MS', 5000) / 1000},
+        }
+        if url not in ('sqlite://', 'sqlite:///:memory:'):
+            # In-memory databases use a single-connection pool with no sizing.
+            options['pool_size'] = env_int('DB_POOL_SIZE', 5)
+            options['max_overflow'] = env_int('DB_MAX_OVERFLOW', 10)
+        return options
+    return {
+        'pool_size': env_int('DB_POOL_SIZE', 10),
+        'max_overflow': env_int('DB_MAX_OVERFLOW', 20),
+        'pool_timeout': env_int('DB_POOL_TIMEOUT', 30),
+        'pool_recycle': env_int('DB_POOL_RECYCLE', 1800),
+        'pool_pre_ping': True,
+    }
+
+# PRAGMAs applied to every new SQLite connection. WAL lets readers carry on
+# while a sale is being written and, together with busy_timeout, turns
+# "database is locked" into a short wait when two cashiers write at once.
+SQLITE_PRAGMAS = {
+    'journal_mode': os.environ.get('SQLITE_JOURNAL_MODE', 'WAL'),
+    'busy_timeout': env_int('SQLITE_BUSY_TIMEOUT_MS', 5000),
+    'synchronous': os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL'),
+    'cache_size': -env_int('SQLITE_CACHE_SIZE_KB', 20000),  # negative = KiB
+    'mmap_size': env_int('SQLITE_MMAP_SIZE', 128 * 1024 * 1024),
+    'temp_store': 'MEMORY',
+}
+
+@event.listens_for(Engine, 'connect')
+def apply_sqlite_pragmas(dbapi_connection, connection_record):
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    cursor = dbapi_connection.cursor()
+    for pragma, value in SQLITE_PRAGMAS.items():
+        cursor.execute(f"PRAGMA {pragma}={value}")
+    cursor.close()
+
+# --- ADMIN CONFIGURATION ---
+ADMIN_USERNAME = os.environ.get('ADMIN_USER')
+ADMIN_PASSWORD = os.environ.get('ADMIN_PASS')
+
+# Largest number of lines accepted by a single /checkout request.
+MAX_CART_LINES = 100
+# Page sizes for the keyset-paginated listings (?per_page=).
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+# Rows fetched per server-side cursor batch (and per CSV chunk) in exports.
+EXPORT_BATCH = 1000
+# Rows per multi-row INSERT in the CSV product import.
+IMPORT_BATCH = 500
+# Most matches returned by the product search type-ahead.
+SEARCH_RESULTS = 20
+# Page sizes for /api/rates.
+RATES_PER_PAGE = 50
+MAX_RATES_PER_PAGE = 200
@@ -0,0 +1,66 @@
+"""Streaming CSV downloads."""
+import csv
+import io
+import zlib
+from datetime import datetime
+
+from flask import abort, current_app, request, stream_with_context
+
+from .config import EXPORT_BATCH
+from .extensions import db
+
+def export_date_range():
+    """(start, end) dates from ?start_date=&end_date= (YYYY-MM-DD); either may be None."""
+    bounds = []
+    for arg in ('start_date', 'end_date'):
+        raw = request.args.get(arg)
+        try:
+            bounds.append(datetime.strptime(raw, '%Y-%m-%d').date() if raw else None)
+        except ValueError:
+            abort(400, f"{arg} must be YYYY-MM-DD")
+    return tuple(bounds)
+
+def stream_csv(filename, header, rows):
+    """Stream rows as a CSV download (gzip'ed when ?gzip=1) without buffering them.
+
+    rows is an iterator straight off a server-side cursor; output is yielded
+    in chunks of EXPORT_BATCH rows, so the first bytes go out before the query
+    has finished and memory stays flat however long the export is.
+    """
+    compress = request.args.get('gzip') in ('1', 'true', 'yes')
+
+    def generate():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        gzipper = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None  # 31 = gzip container
+
+        def flush():
+            data = buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+            return gzipper.compress(data) if gzipper else data
+
+        writer.writerow(header)
+        for count, row in enumerate(rows, 1):
+            writer.writerow(row)
+            if count % EXPORT_BATCH == 0:
+                chunk = flush()
+                if chunk:
+                    yield chunk
+        chunk = flush()
+        if gzipper:
+            chunk += gzipper.flush()
+        if chunk:
+            yield chunk
+
+    if compress:
+        filename += '.gz'
+    response = current_app.response_class(stream_with_context(generate()),
+                                  mimetype='application/gzip' if compress else 'text/csv')
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    response.headers['X-Accel-Buffering'] = 'no'  # let nginx pass chunks straight through
+    return response
+
+def streamed(stmt):
+    """Execute stmt on a server-side cursor, fetching EXPORT_BATCH rows at a time."""
+    return db.session.execute(stmt.execution_options(yield_per=EXPORT_BATCH))
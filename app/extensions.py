@@ -0,0 +1,8 @@
+"""Flask extension instances."""
+from flask_login import LoginManager
+from flask_sqlalchemy import SQLAlchemy
+
+# Initialize Extensions (bound to the app in create_app())
+db = SQLAlchemy()
+login_manager = LoginManager()
+login_manager.login_view = 'auth.login'  # Redirects here if user tries to access restricted page
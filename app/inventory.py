@@ -0,0 +1,341 @@
+"""Products, sales and the shop dashboard."""
+import csv
+import io
+from datetime import datetime, date
+
+from flask import Blueprint, flash, jsonify, redirect, render_template, request, url_for
+from flask_login import current_user, login_required
+
+from .caching import cached_fragment
+from .config import IMPORT_BATCH, MAX_CART_LINES, SEARCH_RESULTS
+from .exports import export_date_range, stream_csv, streamed
+from .extensions import db
+from .metrics import SALE_UNITS, SALES
+from .models import DailySales, Product, Sale
+from .queries import (page_size, product_listing, product_page, product_page_cursor, sales_analytics,
+                      search_products)
+from .validation import clean_product_fields
+
+inventory_bp = Blueprint('inventory', __name__)
+
+@inventory_bp.route('/')
+@login_required
+def dashboard():
+    start_date = request.args.get('start_date')
+    end_date = request.args.get('end_date')
+    analytics_data = None
+    
+    # FILTER: Only get products for the current logged-in user. Each card is
+    # cached under the counters it shows (revenue and profit only move with
+    # items_sold), so only products that sold since the last view re-render.
+    product_cards = [
+        cached_fragment(('product_card', product.id, product.items_sold, product.quantity),
+                        'dashboard_product_card.html', product=lambda product=product: product)
+        for product in product_listing(current_user.id)
+    ]
+
+    if start_date and end_date:
+        try:
+            s_date = datetime.strptime(start_date, '%Y-%m-%d').date()
+            e_date = datetime.strptime(end_date, '%Y-%m-%d').date()
+            
+            analytics_data = sales_analytics(current_user.id, s_date, e_date)
+            if analytics_data is None:
+                analytics_data = 'empty'
+        except ValueError:
+            analytics_data = 'empty'
+
+    return render_template('dashboard.html', product_cards=product_cards, analytics=analytics_data, s_date=start_date, e_date=end_date)
+
+@inventory_bp.route('/products')
+@login_required
+def products():
+    # FILTER: Only show my products
+    page = product_page(current_user.id, request.args.get('cursor'), page_size())
+    return render_template('products.html', products=page.items, next_cursor=page.next_cursor)
+
+@inventory_bp.route('/products/search')
+@login_required
+def product_search():
+    """Ranked name matches among the current shop's products, as JSON.
+
+    Each match carries the url of the products page it is listed on, so
+    the type-ahead can jump to products that are not on the current page.
+    """
+    limit = min(max(request.args.get('limit', SEARCH_RESULTS, type=int), 1), SEARCH_RESULTS)
+    matches = search_products(current_user.id, request.args.get('q', ''), limit)
+    return jsonify([
+        {'id': m.id, 'name': m.name, 'remaining': int(m.remaining), 'sale_price': m.sale_price,
+         'page_url': url_for('inventory.products', cursor=product_page_cursor(m.date_added, m.id),
+                             per_page=request.args.get('per_page'), focus=m.id)}
+        for m in matches
+    ])
+
+@inventory_bp.route('/add_product', methods=['POST'])
+@login_required
+def add_product():
+    # 1. Get data from the form, 2. VALIDATE and 3. CONVERT to whole numbers
+    try:
+        fields = clean_product_fields(
+            request.form.get('name'),
+            request.form.get('purchase_price'),
+            request.form.get('sale_price'),
+            request.form.get('quantity'),
+        )
+    except ValueError as e:
+        flash(str(e), "error")
+        return redirect(url_for('inventory.products'))
+
+    try:
+        # 4. Create the new Product
+        new_product = Product(user_id=current_user.id, **fields)
+
+        db.session.add(new_product)
+        db.session.commit()
+        
+        flash("Product added successfully!", "success")
+
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error adding product: {e}")
+        flash("An error occurred while adding the product.", "error")
+
+    # 5. Refresh the page
+    return redirect(url_for('inventory.products'))
+
+@inventory_bp.route('/import_products', methods=['POST'])
+@login_required
+def import_products():
+    """Bulk stock intake from an uploaded CSV (name,purchase_price,sale_price,quantity).
+
+    The upload is read row by row; valid rows are inserted in batches of
+    IMPORT_BATCH with multi-row INSERTs inside one transaction, while rows
+    that fail add_product's validation are reported and skipped.
+    """
+    upload = request.files.get('file')
+    if upload is None or not upload.filename:
+        flash("Choose a CSV file to import.", "error")
+        return redirect(url_for('inventory.products'))
+
+    imported = 0
+    errors = []
+    batch = []
+    today = date.today()
+
+    def insert_batch():
+        db.session.execute(db.insert(Product), batch)
+        batch.clear()
+
+    try:
+        reader = csv.DictReader(io.TextIOWrapper(upload.stream, encoding='utf-8-sig', newline=''))
+        missing = {'name', 'purchase_price', 'sale_price', 'quantity'} - set(reader.fieldnames or [])
+        if missing:
+            flash(f"CSV is missing column(s): {', '.join(sorted(missing))}.", "error")
+            return redirect(url_for('inventory.products'))
+
+        # Row 1 is the header, so data starts on line 2 of the file.
+        for line_no, row in enumerate(reader, 2):
+            try:
+                fields = clean_product_fields(row.get('name'), row.get('purchase_price'),
+                                              row.get('sale_price'), row.get('quantity'))
+            except ValueError as e:
+                errors.append({'line': line_no, 'error': str(e)})
+                continue
+            batch.append({**fields, 'user_id': current_user.id, 'date_added': today})
+            imported += 1
+            if len(batch) >= IMPORT_BATCH:
+                insert_batch()
+        if batch:
+            insert_batch()
+        db.session.commit()
+    except UnicodeDecodeError:
+        db.session.rollback()
+        flash("The file is not UTF-8 encoded CSV.", "error")
+        return redirect(url_for('inventory.products'))
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error importing products: {e}")
+        flash("An error occurred while importing products. Nothing was saved.", "error")
+        return redirect(url_for('inventory.products'))
+
+    if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+        return jsonify({'success': True, 'imported': imported, 'errors': errors})
+
+    flash(f"Imported {imported} product(s).", "success")
+    if errors:
+        shown = "; ".join(f"line {e['line']}: {e['error']}" for e in errors[:10])
+        more = f" (and {len(errors) - 10} more)" if len(errors) > 10 else ""
+        flash(f"Skipped {len(errors)} row(s): {shown}{more}", "error")
+    return redirect(url_for('inventory.products'))
+
+@inventory_bp.route('/update_sales/<int:id>', methods=['POST'])
+@login_required
+def update_sales(id):
+    try:
+        # 1. SAFE CONVERSION: Handle "4" or "4.00" string formats
+        raw_val = request.form.get('items_sold', '0')
+        qty_sold_now = int(float(raw_val))
+        
+        # 2. VALIDATION: Check for empty or negative input
+        if qty_sold_now <= 0:
+            return jsonify({'success': False, 'error': 'Please enter a valid quantity.'}), 400
+        
+        # 3. SAVE: Stock check, counters and the Sale row in one atomic write.
+        # SECURITY: sell() only matches products owned by the logged-in user.
+        new_remaining = Product.sell(id, current_user.id, qty_sold_now)
+        if new_remaining is not None:
+            db.session.commit()
+            SALES.inc('update_sales')
+            SALE_UNITS.inc('update_sales', amount=qty_sold_now)
+
+    except ValueError:
+        return jsonify({'success': False, 'error': 'Invalid number format.'}), 400
+    except Exception as e:
+        db.session.rollback()
+        # Log the error for yourself and send a clean message to the user
+        print(f"Error in update_sales: {str(e)}")
+        return jsonify({'success': False, 'error': 'Server error. Please try again.'}), 500
+
+    if new_remaining is None:
+        # Nothing was written: release the write lock, then work out why.
+        db.session.rollback()
+        product = Product.query.filter_by(id=id, user_id=current_user.id).first_or_404()
+        return jsonify({
+            'success': False, 
+            'error': f'Not enough stock! Only {int(product.remaining)} left.'
+        }), 400
+
+    # 4. RESPONSE: Handle AJAX (for your JS) or standard form redirect
+    if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+        return jsonify({
+            'success': True,
+            'new_remaining': int(new_remaining),
+            'product_id': id
+        })
+
+    return redirect(request.referrer or url_for('inventory.products'))
+
+@inventory_bp.route('/checkout', methods=['POST'])
+@login_required
+def checkout():
+    """Sell a whole cart in one transaction: every line goes through or none do.
+
+    Expects JSON {"items": [{"product_id": 1, "quantity": 2}, ...]} and
+    returns the new remaining stock for each product in the cart.
+    """
+    payload = request.get_json(silent=True) or {}
+    lines = payload.get('items')
+    if not isinstance(lines, list) or not lines:
+        return jsonify({'success': False, 'error': 'Cart is empty.'}), 400
+    if len(lines) > MAX_CART_LINES:
+        return jsonify({'success': False, 'error': f'A cart can hold at most {MAX_CART_LINES} lines.'}), 400
+
+    # 1. VALIDATION: Merge repeated products so each is checked against its total.
+    cart = {}
+    try:
+        for line in lines:
+            product_id = int(line['product_id'])
+            qty = int(float(line['quantity']))
+            if qty <= 0:
+                raise ValueError
+            cart[product_id] = cart.get(product_id, 0) + qty
+    except (KeyError, TypeError, ValueError):
+        return jsonify({'success': False, 'error': 'Every line needs a product and a positive quantity.'}), 400
+
+    # 2. SAVE: Sell each line atomically; a single short line rolls back the lot.
+    try:
+        remaining = {}
+        short = []
+        # Fixed order so two overlapping carts lock rows in the same sequence.
+        for product_id, qty in sorted(cart.items()):
+            left = Product.sell(product_id, current_user.id, qty)
+            if left is None:
+                short.append(product_id)
+            else:
+                remaining[product_id] = int(left)
+
+        if short:
+            db.session.rollback()
+            found = {
+                p.id: p for p in
+                Product.query.filter(Product.id.in_(short), Product.user_id == current_user.id)
+            }
+            errors = []
+            for product_id in short:
+                product = found.get(product_id)
+                if product is None:
+                    errors.append({'product_id': product_id, 'error': 'Product not found.'})
+                else:
+                    errors.append({
+                        'product_id': product_id,
+                        'error': f'Not enough stock for {product.name}! Only {int(product.remaining)} left.',
+                        'remaining': int(product.remaining),
+                    })
+            return jsonify({'success': False, 'error': errors[0]['error'], 'lines': errors}), 400
+
+        db.session.commit()
+        SALES.inc('checkout', amount=len(cart))
+        SALE_UNITS.inc('checkout', amount=sum(cart.values()))
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error in checkout: {str(e)}")
+        return jsonify({'success': False, 'error': 'Server error. Please try again.'}), 500
+
+    return jsonify({
+        'success': True,
+        'remaining': {str(product_id): left for product_id, left in remaining.items()},
+    })
+
+@inventory_bp.route('/delete/<int:id>')
+@login_required
+def delete_product(id):
+    # SECURITY: Ensure product belongs to current user
+    product = Product.query.filter_by(id=id, user_id=current_user.id).first_or_404()
+    
+    DailySales.query.filter_by(product_id=product.id).delete()
+    db.session.delete(product)
+    db.session.commit()
+    flash("Product deleted successfully.", "info")
+    return redirect(request.referrer or url_for('inventory.products'))
+
+@inventory_bp.route('/export/sales.csv')
+@login_required
+def export_sales():
+    start, end = export_date_range()
+    stmt = (
+        db.select(Sale.id, Sale.sale_date, Product.id, Product.name, Sale.quantity_sold,
+                  Product.sale_price, Product.purchase_price,
+                  Sale.quantity_sold * Product.sale_price,
+                  Sale.quantity_sold * (Product.sale_price - Product.purchase_price))
+        .join(Product, Sale.product_id == Product.id)
+        .where(Product.user_id == current_user.id)
+        # Matches the walk over ix_product_user_date then ix_sale_product_date,
+        # so rows stream straight off the indexes with no sort step.
+        .order_by(Product.date_added, Product.id, Sale.sale_date)
+    )
+    if start:
+        stmt = stmt.where(Sale.sale_date >= start)
+    if end:
+        stmt = stmt.where(Sale.sale_date <= end)
+    header = ['sale_id', 'sale_date', 'product_id', 'product', 'quantity', 'sale_price',
+              'purchase_price', 'revenue', 'profit']
+    return stream_csv('sales.csv', header, streamed(stmt))
+
+@inventory_bp.route('/export/products.csv')
+@login_required
+def export_products():
+    start, end = export_date_range()
+    stmt = (
+        db.select(Product.id, Product.date_added, Product.name, Product.quantity, Product.items_sold,
+                  Product.quantity - Product.items_sold, Product.purchase_price, Product.sale_price,
+                  Product.total_revenue, Product.total_profit_generated)
+        .where(Product.user_id == current_user.id)
+        .order_by(Product.date_added, Product.id)
+    )
+    if start:
+        stmt = stmt.where(Product.date_added >= start)
+    if end:
+        stmt = stmt.where(Product.date_added <= end)
+    header = ['product_id', 'date_added', 'name', 'quantity', 'items_sold', 'remaining',
+              'purchase_price', 'sale_price', 'total_revenue', 'total_profit']
+    return stream_csv('products.csv', header, streamed(stmt))
@@ -0,0 +1,230 @@
+"""Background jobs: the reminder batch queue and its workers."""
+import csv
+import json
+import os
+import sqlite3
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from .config import SQLITE_PRAGMAS, basedir, env_int
+from .extensions import db
+from .queries import overdue_loans
+from .validation import normalize_phone
+
+# "Remind overdue" renders a WhatsApp message and wa.me link for every unpaid
+# loan older than N days into a CSV the shopkeeper downloads. The work runs
+# off the request thread: jobs go into a small SQLite-file queue
+# (instance/jobs.db) and are drained by a background thread pool in each web
+# process, or by `flask run-reminder-worker` when REMINDER_WORKERS=0.
+REMINDER_AGE_DAYS = env_int('REMINDER_AGE_DAYS', 7)
+REMINDER_BATCH = env_int('REMINDER_BATCH', 500)
+REMINDER_WORKERS = env_int('REMINDER_WORKERS', 1)
+# A job "running" for longer than this is assumed orphaned and handed out again.
+JOB_TIMEOUT_SECONDS = env_int('JOB_TIMEOUT_SECONDS', 600)
+# Finished jobs and their CSVs are deleted once they are this old.
+REMINDER_RETENTION_DAYS = env_int('REMINDER_RETENTION_DAYS', 7)
+
+def loan_reminder(loan):
+    """(message, wa.me link) asking the customer to clear this loan."""
+    message = (
+        f"Hello {loan.customer_name},\n\n"
+        f"This is a receipt from Tuck Shop.\n"
+        f"Items: {loan.product_taken}\n"
+        f"Total Amount: PKR {loan.amount}\n"
+        + (f"Remaining: PKR {loan.owed}\n" if loan.paid_amount else "") +
+        f"Date: {loan.date_added.strftime('%d %b, %I:%M %p')}\n\n"
+        f"Please clear your dues at your earliest convenience. Thank you!"
+    )
+    return message, f"https://wa.me/{normalize_phone(loan.phone_number)}?text={urllib.parse.quote(message)}"
+
+class JobQueue:
+    """A minimal durable job queue in a local SQLite file.
+
+    A stand-in for a real broker: jobs survive restarts, claim() hands each
+    job to exactly one worker (BEGIN IMMEDIATE serialises claimers across
+    processes), and jobs whose worker died are re-queued after
+    JOB_TIMEOUT_SECONDS.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS job (
+            id INTEGER PRIMARY KEY,
+            kind TEXT NOT NULL,
+            user_id INTEGER NOT NULL,
+            payload TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'queued',
+            created_at REAL NOT NULL,
+            started_at REAL,
+            finished_at REAL,
+            result TEXT,
+            error TEXT
+        );
+        CREATE INDEX IF NOT EXISTS ix_job_status ON job (status, id);
+        CREATE INDEX IF NOT EXISTS ix_job_user ON job (user_id, id);
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._ready = False
+
+    def _connect(self):
+        if not self._ready:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=SQLITE_PRAGMAS['busy_timeout'] / 1000,
+                               isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        if not self._ready:
+            conn.executescript(self.SCHEMA)
+            self._ready = True
+        return conn
+
+    def enqueue(self, kind, user_id, payload):
+        conn = self._connect()
+        try:
+            return conn.execute(
+                "INSERT INTO job (kind, user_id, payload, created_at) VALUES (?, ?, ?, ?)",
+                (kind, user_id, json.dumps(payload), time.time()),
+            ).lastrowid
+        finally:
+            conn.close()
+
+    def claim(self):
+        """Mark the oldest waiting job running and return it, or None."""
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT * FROM job WHERE status = 'queued' OR (status = 'running' AND started_at < ?) "
+                "ORDER BY id LIMIT 1", (time.time() - JOB_TIMEOUT_SECONDS,)
+            ).fetchone()
+            if row is not None:
+                conn.execute("UPDATE job SET status = 'running', started_at = ? WHERE id = ?",
+                             (time.time(), row['id']))
+            conn.execute("COMMIT")
+            return self._job(row)
+        finally:
+            conn.close()
+
+    def finish(self, job_id, result=None, error=None):
+        conn = self._connect()
+        try:
+            conn.execute(
+                "UPDATE job SET status = ?, finished_at = ?, result = ?, error = ? WHERE id = ?",
+                ('failed' if error else 'done', time.time(), json.dumps(result), error, job_id),
+            )
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _job(row):
+        if row is None:
+            return None
+        job = dict(row)
+        job['payload'] = json.loads(job['payload'])
+        job['result'] = json.loads(job['result']) if job['result'] else None
+        return job
+
+    def get(self, job_id, user_id):
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT * FROM job WHERE id = ? AND user_id = ?", (job_id, user_id)).fetchone()
+            return self._job(row)
+        finally:
+            conn.close()
+
+    def purge(self, before):
+        """Delete jobs that finished before the given epoch time; returns how many."""
+        conn = self._connect()
+        try:
+            return conn.execute(
+                "DELETE FROM job WHERE status IN ('done', 'failed') AND finished_at < ?", (before,)
+            ).rowcount
+        finally:
+            conn.close()
+
+    def recent(self, user_id, kind, limit=5):
+        conn = self._connect()
+        try:
+            return [self._job(row) for row in conn.execute(
+                "SELECT * FROM job WHERE user_id = ? AND kind = ? ORDER BY id DESC LIMIT ?",
+                (user_id, kind, limit))]
+        finally:
+            conn.close()
+
+job_queue = JobQueue(os.environ.get('JOB_QUEUE_PATH') or os.path.join(basedir, 'instance', 'jobs.db'))
+_job_pool = ThreadPoolExecutor(max_workers=max(REMINDER_WORKERS, 1), thread_name_prefix='jobs')
+
+def reminder_dir(app):
+    return os.path.join(app.instance_path, 'reminders')
+
+def build_reminder_batch(app, job):
+    """Write the job's reminder CSV; returns the result stored on the job."""
+    days = job['payload']['days']
+    cutoff = datetime.now() - timedelta(days=days)
+    os.makedirs(reminder_dir(app), exist_ok=True)
+    path = os.path.join(reminder_dir(app), f"{job['id']}.csv")
+    count = 0
+    total = 0
+    with app.app_context(), open(path + '.part', 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['loan_id', 'customer_name', 'phone_number', 'date_added',
+                         'amount_owed', 'message', 'whatsapp_link'])
+        cursor = None
+        while True:
+            batch = overdue_loans(job['user_id'], cutoff, cursor, REMINDER_BATCH)
+            for loan in batch.items:
+                message, link = loan_reminder(loan)
+                writer.writerow([loan.id, loan.customer_name, loan.phone_number,
+                                 loan.date_added.strftime('%Y-%m-%d'), loan.owed, message, link])
+                count += 1
+                total += loan.owed
+            db.session.expunge_all()
+            cursor = batch.next_cursor
+            if cursor is None:
+                break
+    os.replace(path + '.part', path)
+    return {'loans': count, 'total': round(total, 2), 'days': days}
+
+JOB_HANDLERS = {'reminders': build_reminder_batch}
+
+def sweep_reminders(app, max_age_days=REMINDER_RETENTION_DAYS):
+    """Drop finished jobs and reminder CSVs older than max_age_days; returns files removed."""
+    before = time.time() - max_age_days * 86400
+    job_queue.purge(before)
+    removed = 0
+    folder = reminder_dir(app)
+    for name in os.listdir(folder) if os.path.isdir(folder) else []:
+        path = os.path.join(folder, name)
+        try:
+            if os.path.getmtime(path) < before:
+                os.remove(path)
+                removed += 1
+        except FileNotFoundError:
+            pass  # another worker's sweep got there first
+    return removed
+
+def run_queued_jobs(app):
+    """Work through the queue until it is empty, then sweep out expired output.
+
+    Returns the number of jobs run.
+    """
+    ran = 0
+    while True:
+        job = job_queue.claim()
+        if job is None:
+            if ran:
+                sweep_reminders(app)
+            return ran
+        try:
+            job_queue.finish(job['id'], result=JOB_HANDLERS[job['kind']](app, job))
+        except Exception as e:
+            app.logger.exception("Job %s (%s) failed", job['id'], job['kind'])
+            job_queue.finish(job['id'], error=str(e))
+        ran += 1
+
+def queue_jobs(app):
+    """Have this process's job pool drain the queue (unless a separate worker does)."""
+    if REMINDER_WORKERS:
+        _job_pool.submit(run_queued_jobs, app)
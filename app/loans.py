@@ -0,0 +1,199 @@
+"""Credit sales: loans, payments, customer accounts and reminders."""
+from datetime import datetime, timedelta
+
+from flask import (Blueprint, abort, current_app, flash, jsonify, redirect, render_template, request,
+                   send_from_directory, url_for)
+from flask_login import current_user, login_required
+from sqlalchemy import func
+
+from .exports import export_date_range, stream_csv, streamed
+from .extensions import db
+from .jobs import REMINDER_AGE_DAYS, job_queue, loan_reminder, queue_jobs, reminder_dir
+from .metrics import LOANS_CREATED
+from .models import Customer, LedgerEntry, Loan
+from .queries import (customer_balance, customer_ledger, customer_loans, loan_history, page_size,
+                      top_debtors, unpaid_loans, unpaid_summary)
+from .validation import normalize_phone
+
+loans_bp = Blueprint('loans', __name__)
+
+@loans_bp.route('/loans')
+@login_required
+def loans():
+    # FILTER: Only show my loans
+    unpaid = unpaid_loans(current_user.id, request.args.get('cursor'), page_size())
+    unpaid_count, unpaid_total = unpaid_summary(current_user.id)
+    history = loan_history(current_user.id)
+    return render_template('loans.html', unpaid=unpaid.items, next_cursor=unpaid.next_cursor,
+                           unpaid_count=unpaid_count, unpaid_total=unpaid_total, history=history,
+                           debtors=top_debtors(current_user.id),
+                           reminder_jobs=job_queue.recent(current_user.id, 'reminders'),
+                           reminder_days=REMINDER_AGE_DAYS)
+
+@loans_bp.route('/add_loan', methods=['POST'])
+@login_required
+def add_loan():
+    try:
+        amount = round(float(request.form['amount']), 2)
+        phone = normalize_phone(request.form['phone_number'])
+        if amount <= 0:
+            raise ValueError("Loan amount must be more than zero.")
+        if not phone:
+            raise ValueError("Please enter a valid phone number.")
+
+        # SAVE: Add user_id, and book it to the customer's ledger account
+        customer_id = Customer.for_phone(current_user.id, phone, request.form['customer_name'])
+        new_loan = Loan(
+            customer_name=request.form['customer_name'],
+            product_taken=request.form['product_taken'],
+            amount=amount,
+            phone_number=request.form['phone_number'],
+            user_id=current_user.id,
+            customer_id=customer_id,
+        )
+        db.session.add(new_loan)
+        db.session.flush()
+        Customer.post(customer_id, amount=amount, kind='loan', loan_id=new_loan.id)
+        db.session.commit()
+        LOANS_CREATED.inc()
+        return redirect(url_for('loans.loans'))
+    except Exception as e:
+        db.session.rollback()
+        return f"Error: {e}"
+
+@loans_bp.route('/send_whatsapp/<int:id>')
+@login_required
+def send_whatsapp(id):
+    # SECURITY: Ensure loan belongs to current user
+    loan = Loan.query.filter_by(id=id, user_id=current_user.id).first_or_404()
+    _, whatsapp_url = loan_reminder(loan)
+    return redirect(whatsapp_url)
+
+@loans_bp.route('/mark_paid/<int:id>')
+@login_required
+def mark_paid(id):
+    # SECURITY: pay() only matches the current user's unpaid loans
+    try:
+        loan = Loan.pay(id, current_user.id)
+    except ValueError as e:
+        db.session.rollback()
+        flash(str(e), "error")
+        return redirect(url_for('loans.loans'))
+    if loan is None:
+        abort(404)
+    db.session.commit()
+    return redirect(url_for('loans.loans'))
+
+@loans_bp.route('/pay_loan/<int:id>', methods=['POST'])
+@login_required
+def pay_loan(id):
+    """Record a partial payment against one loan."""
+    try:
+        amount = float(request.form.get('amount', ''))
+    except ValueError:
+        flash("Please enter a valid amount.", "error")
+        return redirect(url_for('loans.loans'))
+    try:
+        loan = Loan.pay(id, current_user.id, amount)
+    except ValueError as e:
+        db.session.rollback()
+        flash(str(e), "error")
+        return redirect(url_for('loans.loans'))
+    if loan is None:
+        abort(404)
+    db.session.commit()
+    flash(f"Received PKR {amount:.2f} from {loan.customer_name}.", "success")
+    return redirect(request.referrer or url_for('loans.loans'))
+
+@loans_bp.route('/delete_loan/<int:id>')
+@login_required
+def delete_loan(id):
+    # SECURITY: Ensure loan belongs to current user
+    loan = Loan.query.filter_by(id=id, user_id=current_user.id).first_or_404()
+    if loan.customer_id is not None:
+        if loan.status == 0 and loan.owed > 0:
+            # Whatever was still owed comes off the customer's balance.
+            Customer.post(loan.customer_id, amount=-loan.owed, kind='writeoff')
+        # The customer's ledger history outlives the loan row.
+        LedgerEntry.query.filter_by(loan_id=loan.id).update({'loan_id': None})
+    db.session.delete(loan)
+    db.session.commit()
+    return redirect(url_for('loans.loans'))
+
+@loans_bp.route('/customer/<int:id>')
+@login_required
+def customer(id):
+    # SECURITY: Ensure customer belongs to current user
+    account = Customer.query.filter_by(id=id, user_id=current_user.id).first_or_404()
+    return render_template('customer.html', customer=account,
+                           entries=customer_ledger(account.id), loans=customer_loans(account.id))
+
+@loans_bp.route('/customer_balance')
+@login_required
+def customer_balance_lookup():
+    """Outstanding balance for ?phone= (any format), e.g. while typing a new loan."""
+    account = customer_balance(current_user.id, request.args.get('phone', ''))
+    if account is None:
+        return jsonify({'success': False, 'error': 'No customer with this phone number.'}), 404
+    return jsonify({'success': True, 'customer': {
+        'id': account.id, 'name': account.name, 'phone': account.phone, 'balance': account.balance,
+    }})
+
+@loans_bp.route('/export/loans.csv')
+@login_required
+def export_loans():
+    start, end = export_date_range()
+    stmt = (
+        db.select(Loan.id, Loan.date_added, Loan.customer_name, Loan.phone_number,
+                  Loan.product_taken, Loan.amount,
+                  db.case((Loan.status == 1, Loan.amount), else_=Loan.paid_amount),
+                  db.case((Loan.status == 1, 0.0), else_=func.round(Loan.amount - Loan.paid_amount, 2)),
+                  db.case((Loan.status == 1, 'paid'), (Loan.paid_amount > 0, 'part paid'), else_='unpaid'))
+        .where(Loan.user_id == current_user.id)
+        .order_by(Loan.date_added, Loan.id)
+    )
+    if start:
+        stmt = stmt.where(Loan.date_added >= datetime.combine(start, datetime.min.time()))
+    if end:
+        stmt = stmt.where(Loan.date_added < datetime.combine(end + timedelta(days=1), datetime.min.time()))
+    header = ['loan_id', 'date_added', 'customer_name', 'phone_number', 'products', 'amount',
+              'paid_amount', 'amount_owed', 'status']
+    return stream_csv('loans.csv', header, streamed(stmt))
+
+@loans_bp.route('/reminders', methods=['POST'])
+@login_required
+def queue_reminders():
+    """Queue a reminder batch for every unpaid loan older than ?days."""
+    try:
+        days = int(request.form.get('days', REMINDER_AGE_DAYS))
+        if days < 0:
+            raise ValueError
+    except ValueError:
+        return jsonify({'success': False, 'error': 'Please enter a valid number of days.'}), 400
+    job_id = job_queue.enqueue('reminders', current_user.id, {'days': days})
+    queue_jobs(current_app._get_current_object())
+    if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+        return jsonify({'success': True, 'job_id': job_id}), 202
+    flash("Preparing reminders for overdue loans. The download will appear shortly.", "success")
+    return redirect(url_for('loans.loans'))
+
+@loans_bp.route('/reminders/<int:job_id>')
+@login_required
+def reminder_status(job_id):
+    job = job_queue.get(job_id, current_user.id)
+    if job is None:
+        return jsonify({'success': False, 'error': 'Job not found.'}), 404
+    return jsonify({
+        'success': True, 'status': job['status'], 'error': job['error'],
+        'result': job['result'],
+        'download': url_for('loans.download_reminders', job_id=job_id) if job['status'] == 'done' else None,
+    })
+
+@loans_bp.route('/reminders/<int:job_id>/download')
+@login_required
+def download_reminders(job_id):
+    job = job_queue.get(job_id, current_user.id)
+    if job is None or job['status'] != 'done':
+        abort(404)
+    return send_from_directory(reminder_dir(current_app), f'{job_id}.csv', as_attachment=True,
+                               download_name=f'reminders-{job_id}.csv', mimetype='text/csv')
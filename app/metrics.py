@@ -0,0 +1,300 @@
+"""Prometheus metrics shared by every worker process on a host."""
+import atexit
+import bisect
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from flask import Blueprint, abort, current_app, g, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import Pool, QueuePool
+
+from .config import SQLITE_PRAGMAS, basedir, env_int
+from .extensions import db
+
+metrics_bp = Blueprint('metrics', __name__)
+
+# Prometheus text-format counters and histograms served at /metrics. Always
+# on: recording is a dict lookup and a bisect under one lock per request.
+# gunicorn runs several workers behind one port and a scrape reaches only one
+# of them, so every process adds its increments into a shared SQLite file
+# (METRICS_PATH, default instance/metrics.db) at least every
+# METRICS_FLUSH_SECONDS, and /metrics reports the totals from that file.
+# Counters therefore survive worker restarts and never run backwards.
+# Set METRICS_TOKEN to require "Authorization: Bearer <token>" on scrapes.
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+METRICS_FLUSH_SECONDS = env_int('METRICS_FLUSH_SECONDS', 5)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+class Metric:
+    """A labelled counter (kind='counter') or histogram (kind='histogram').
+
+    Holds only the increments not yet flushed to metric_store.
+    """
+
+    def __init__(self, name, help_text, labels=(), kind='counter', buckets=None):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self.kind = kind
+        self.buckets = buckets
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def observe(self, *label_values, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(label_values)
+            if series is None:
+                series = self._values[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def _label_text(self, label_values, extra=()):
+        pairs = list(zip(self.labels, label_values)) + list(extra)
+        if not pairs:
+            return ''
+        escaped = (
+            (k, str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+            for k, v in pairs
+        )
+        return '{' + ','.join(f'{k}="{v}"' for k, v in escaped) + '}'
+
+    def drain(self):
+        """Hand over the pending increments as (label_values, field, amount) rows."""
+        with self._lock:
+            values, self._values = self._values, {}
+        rows = []
+        for label_values, value in values.items():
+            if self.kind == 'counter':
+                rows.append((label_values, 'value', value))
+                continue
+            counts, total = value
+            rows += [(label_values, f'bucket{i}', count) for i, count in enumerate(counts) if count]
+            rows.append((label_values, 'sum', total))
+        return rows
+
+    def render(self, rows):
+        """Exposition lines for the flushed totals, given as (label_values, field, value) rows."""
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.kind}']
+        values = {}
+        for label_values, field, value in rows:
+            if self.kind == 'counter':
+                values[label_values] = int(value) if float(value).is_integer() else value
+                continue
+            series = values.setdefault(label_values, ([0] * (len(self.buckets) + 1), [0.0]))
+            if field == 'sum':
+                series[1][0] = value
+            else:
+                series[0][int(field[len('bucket'):])] = int(value)
+        values = {key: (v[0], v[1][0]) if self.kind == 'histogram' else v for key, v in values.items()}
+        for label_values, value in sorted(values.items()):
+            if self.kind == 'counter':
+                lines.append(f'{self.name}{self._label_text(label_values)} {value}')
+                continue
+            counts, total = value
+            running = 0
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                running += count
+                le = bound if bound == '+Inf' else repr(float(bound))
+                lines.append(f'{self.name}_bucket{self._label_text(label_values, [("le", le)])} {running}')
+            lines.append(f'{self.name}_sum{self._label_text(label_values)} {total}')
+            lines.append(f'{self.name}_count{self._label_text(label_values)} {running}')
+        return lines
+
+class MetricStore:
+    """Metric totals shared by every process on this host, in a SQLite file.
+
+    Processes add their increments (never absolute values), so a worker that
+    exits or is recycled leaves its counts behind. Gauges are per process and
+    are dropped once their process stops refreshing them.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS metric_total (
+            name TEXT NOT NULL,
+            labels TEXT NOT NULL,
+            field TEXT NOT NULL,
+            value REAL NOT NULL,
+            PRIMARY KEY (name, labels, field)
+        );
+        CREATE TABLE IF NOT EXISTS metric_gauge (
+            name TEXT NOT NULL,
+            pid INTEGER NOT NULL,
+            value REAL NOT NULL,
+            updated_at REAL NOT NULL,
+            PRIMARY KEY (name, pid)
+        );
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._ready = False
+        self._flusher_pid = None
+        self._flusher_lock = threading.Lock()
+        self._app = None
+
+    def _connect(self):
+        if not self._ready:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=SQLITE_PRAGMAS['busy_timeout'] / 1000,
+                               isolation_level=None)
+        if not self._ready:
+            conn.executescript(self.SCHEMA)
+            self._ready = True
+        return conn
+
+    def start_flusher(self, app):
+        """Start this process's background flush thread (once per process, after any fork)."""
+        if self._flusher_pid == os.getpid():
+            return
+        with self._flusher_lock:
+            if self._flusher_pid == os.getpid():
+                return
+            self._flusher_pid = os.getpid()
+            self._app = app
+            threading.Thread(target=self._flush_forever, name='metrics-flush', daemon=True).start()
+            atexit.register(self.flush)
+
+    def _flush_forever(self):
+        while True:
+            time.sleep(METRICS_FLUSH_SECONDS)
+            try:
+                with self._app.app_context():
+                    self.flush(pool_gauges())
+            except Exception:
+                self._app.logger.exception("Flushing metrics failed")
+
+    def flush(self, gauges=()):
+        """Add every metric's pending increments to the totals; record this process's gauges."""
+        rows = [(metric.name, json.dumps(label_values), field, amount)
+                for metric in METRICS for label_values, field, amount in metric.drain()]
+        if not rows and not gauges:
+            return
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.executemany(
+                "INSERT INTO metric_total (name, labels, field, value) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (name, labels, field) DO UPDATE SET value = value + excluded.value", rows)
+            now = time.time()
+            conn.executemany(
+                "INSERT OR REPLACE INTO metric_gauge (name, pid, value, updated_at) VALUES (?, ?, ?, ?)",
+                [(name, os.getpid(), value, now) for name, value in gauges])
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+
+    def totals(self):
+        """{metric name: [(label_values, field, value)]} summed over all processes."""
+        conn = self._connect()
+        try:
+            totals = {}
+            for name, labels, field, value in conn.execute(
+                    "SELECT name, labels, field, value FROM metric_total"):
+                totals.setdefault(name, []).append((tuple(json.loads(labels)), field, value))
+            return totals
+        finally:
+            conn.close()
+
+    def gauges(self):
+        """{gauge name: [(pid, value)]} for processes that flushed recently."""
+        conn = self._connect()
+        try:
+            conn.execute("DELETE FROM metric_gauge WHERE updated_at < ?",
+                         (time.time() - 3 * METRICS_FLUSH_SECONDS,))
+            gauges = {}
+            for name, pid, value in conn.execute(
+                    "SELECT name, pid, value FROM metric_gauge ORDER BY name, pid"):
+                gauges.setdefault(name, []).append((pid, value))
+            return gauges
+        finally:
+            conn.close()
+
+metric_store = MetricStore(os.environ.get('METRICS_PATH') or os.path.join(basedir, 'instance', 'metrics.db'))
+
+REQUEST_LATENCY = Metric('tuckshop_request_duration_seconds', 'Request latency by Flask endpoint.',
+                         ('endpoint', 'method'), kind='histogram', buckets=LATENCY_BUCKETS)
+REQUESTS = Metric('tuckshop_requests_total', 'Requests by Flask endpoint and status code.',
+                  ('endpoint', 'method', 'status'))
+DB_CHECKOUTS = Metric('tuckshop_db_pool_checkouts_total', 'Connections handed out by the pool.')
+DB_CONNECTS = Metric('tuckshop_db_pool_connects_total', 'New DBAPI connections opened by the pool.')
+SQLITE_BUSY = Metric('tuckshop_sqlite_busy_total',
+                     'Statements that gave up with "database is locked/busy" after busy_timeout.')
+SALES = Metric('tuckshop_sales_total', 'Sale rows recorded (rate() gives sales per minute).', ('source',))
+SALE_UNITS = Metric('tuckshop_sale_units_total', 'Units sold.', ('source',))
+LOANS_CREATED = Metric('tuckshop_loans_created_total', 'Loans recorded.')
+METRICS = [REQUEST_LATENCY, REQUESTS, DB_CHECKOUTS, DB_CONNECTS, SQLITE_BUSY,
+           SALES, SALE_UNITS, LOANS_CREATED]
+
+@event.listens_for(Pool, 'checkout')
+def _count_pool_checkout(dbapi_connection, connection_record, connection_proxy):
+    DB_CHECKOUTS.inc()
+
+@event.listens_for(Pool, 'connect')
+def _count_pool_connect(dbapi_connection, connection_record):
+    DB_CONNECTS.inc()
+
+@event.listens_for(Engine, 'handle_error')
+def _count_sqlite_busy(context):
+    error = context.original_exception
+    if isinstance(error, sqlite3.OperationalError) and (
+            'locked' in str(error) or 'busy' in str(error)):
+        SQLITE_BUSY.inc()
+
+# Request hooks, registered app-wide by create_app().
+def metrics_request_start():
+    metric_store.start_flusher(current_app._get_current_object())
+    g.metrics_start = time.perf_counter()
+
+def metrics_request_end(response):
+    start = g.pop('metrics_start', None)
+    if start is not None:
+        endpoint = request.endpoint or 'unmatched'
+        REQUEST_LATENCY.observe(endpoint, request.method, value=time.perf_counter() - start)
+        REQUESTS.inc(endpoint, request.method, str(response.status_code))
+    return response
+
+POOL_GAUGES = [
+    ('tuckshop_db_pool_size', 'Configured pool size.'),
+    ('tuckshop_db_pool_checked_out', 'Connections currently in use; at size + overflow '
+     'limit, further requests wait for a checkout.'),
+    ('tuckshop_db_pool_overflow', 'Connections open beyond the pool size.'),
+]
+
+def pool_gauges():
+    """This process's point-in-time pool occupancy as (name, value) pairs."""
+    pool = db.engine.pool
+    if not isinstance(pool, QueuePool):
+        return []
+    return list(zip([name for name, _ in POOL_GAUGES],
+                    [pool.size(), pool.checkedout(), max(0, pool.overflow())]))
+
+def render_metrics():
+    """The /metrics body: totals across every process, pool gauges per process (pid label)."""
+    metric_store.flush(pool_gauges())
+    totals = metric_store.totals()
+    lines = []
+    for metric in METRICS:
+        lines += metric.render(totals.get(metric.name, []))
+    gauges = metric_store.gauges()
+    for name, help_text in POOL_GAUGES:
+        if name in gauges:
+            lines += [f'# HELP {name} {help_text}', f'# TYPE {name} gauge']
+            lines += [f'{name}{{pid="{pid}"}} {int(value)}' for pid, value in gauges[name]]
+    return lines
+
+@metrics_bp.route('/metrics')
+def metrics():
+    if METRICS_TOKEN and request.headers.get('Authorization') != f'Bearer {METRICS_TOKEN}':
+        abort(401)
+    lines = render_metrics()
+    return current_app.response_class('\n'.join(lines) + '\n',
+                                      content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,372 @@
+"""Database models."""
+from datetime import datetime, date
+
+from flask_login import UserMixin
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from .caching import user_cache
+from .extensions import db
+from .security import hash_password, verify_password
+from .validation import normalize_phone
+
+class User(UserMixin, db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    username = db.Column(db.String(80), unique=True, nullable=False)
+    email = db.Column(db.String(120), unique=True, nullable=False)
+    password_hash = db.Column(db.String(200), nullable=False)
+    is_active = db.Column(db.Boolean, default=True)
+    
+    def set_password(self, password):
+        self.password_hash = hash_password(password)
+        if self.id is not None:
+            DataVersion.bump(user_version_key(self.id))
+            user_cache.invalidate(self.id)
+
+    def check_password(self, password):
+        return verify_password(self.password_hash, password)
+
+class Product(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+    quantity = db.Column(db.Integer, nullable=False)     # Total stock ever purchased
+    purchase_price = db.Column(db.Float, nullable=False) # Buying price
+    sale_price = db.Column(db.Float, nullable=False)     # Selling price
+    date_added = db.Column(db.Date, default=date.today)
+
+    # Running sales counters. Kept in step with the Sale table by
+    # sell() so reads never have to touch Product.sales.
+    # Rebuild them with `flask reconcile-stock` if they ever drift.
+    items_sold = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    total_revenue = db.Column(db.Float, nullable=False, default=0, server_default='0')
+    total_profit_generated = db.Column(db.Float, nullable=False, default=0, server_default='0')
+    
+    # Link to User (Owner)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+
+    # Link to Sales
+    sales = db.relationship('Sale', backref='product', lazy=True, cascade="all, delete-orphan")
+
+    __table_args__ = (
+        # product_listing(): filter_by(user_id).order_by(date_added.desc())
+        db.Index('ix_product_user_date', 'user_id', 'date_added'),
+    )
+
+    @property
+    def remaining(self):
+        return self.quantity - (self.items_sold or 0)
+
+    @property
+    def profit_per_item(self):
+        return self.sale_price - self.purchase_price
+
+    @classmethod
+    def sell(cls, product_id, user_id, qty):
+        """Record a sale of qty units if (and only if) enough stock is left.
+
+        The stock check and the counter increment are a single conditional
+        UPDATE, so two concurrent sales can never both pass the check and
+        oversell; the database serialises them on the product row. Returns
+        the new remaining count, or None when the product isn't this user's
+        or has fewer than qty units left. The caller commits.
+        """
+        stmt = (
+            db.update(cls)
+            .where(cls.id == product_id, cls.user_id == user_id,
+                   cls.quantity - cls.items_sold >= qty)
+            .values(
+                items_sold=cls.items_sold + qty,
+                total_revenue=cls.total_revenue + qty * cls.sale_price,
+                total_profit_generated=cls.total_profit_generated + qty * (cls.sale_price - cls.purchase_price),
+            )
+            .execution_options(synchronize_session=False)
+        )
+        sold = (cls.quantity - cls.items_sold, cls.sale_price, cls.purchase_price)
+        if db.engine.dialect.update_returning:
+            row = db.session.execute(stmt.returning(*sold)).first()
+        else:
+            # No RETURNING (SQLite < 3.35): the UPDATE already holds the write
+            # lock, so reading the row back straight away is still consistent.
+            if db.session.execute(stmt).rowcount == 0:
+                return None
+            row = db.session.execute(db.select(*sold).where(cls.id == product_id)).first()
+        if row is None:
+            return None
+
+        remaining, sale_price, purchase_price = row
+        today = date.today()
+        db.session.add(Sale(product_id=product_id, quantity_sold=qty, sale_date=today))
+        DailySales.apply(product_id, user_id, today, qty, sale_price, purchase_price)
+        return remaining
+
+class Sale(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    product_id = db.Column(db.Integer, db.ForeignKey('product.id'), nullable=False)
+    quantity_sold = db.Column(db.Integer, nullable=False)
+    sale_date = db.Column(db.Date, default=date.today)
+
+    __table_args__ = (
+        # Per-product sales (counter/rollup rebuilds, cascades) and date ranges.
+        db.Index('ix_sale_product_date', 'product_id', 'sale_date'),
+        db.Index('ix_sale_date', 'sale_date'),
+    )
+
+class DailySales(db.Model):
+    """Per-product, per-day sales rollup used by every date-range report.
+
+    Rows are upserted alongside each Sale, so a report over a year reads at
+    most (products x days) rows instead of scanning the sale table.
+    Rebuild it from scratch with `flask backfill-daily-sales`.
+    """
+    __tablename__ = 'daily_sales'
+
+    product_id = db.Column(db.Integer, db.ForeignKey('product.id'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    # Denormalised owner so shop reports filter without joining product.
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    units = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Float, nullable=False, default=0)
+    cost = db.Column(db.Float, nullable=False, default=0)
+    profit = db.Column(db.Float, nullable=False, default=0)
+
+    __table_args__ = (
+        # sales_analytics(): user_id = ? AND day BETWEEN ? AND ?
+        db.Index('ix_daily_sales_user_day', 'user_id', 'day'),
+    )
+
+    @classmethod
+    def apply(cls, product_id, user_id, day, qty, sale_price, purchase_price):
+        """Add qty units of a product sold on day to the rollup (negative to undo)."""
+        revenue = qty * sale_price
+        cost = qty * purchase_price
+        stmt = _dialect_insert()(cls).values(
+            product_id=product_id, day=day, user_id=user_id,
+            units=qty, revenue=revenue, cost=cost, profit=revenue - cost,
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[cls.product_id, cls.day],
+            set_={
+                'units': cls.units + stmt.excluded.units,
+                'revenue': cls.revenue + stmt.excluded.revenue,
+                'cost': cls.cost + stmt.excluded.cost,
+                'profit': cls.profit + stmt.excluded.profit,
+            },
+        )
+        db.session.execute(stmt)
+
+def _dialect_insert():
+    # SQLite and PostgreSQL both spell upserts as INSERT ... ON CONFLICT.
+    if db.engine.dialect.name == 'postgresql':
+        return postgresql_insert
+    return sqlite_insert
+
+class Loan(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    customer_name = db.Column(db.String(100), nullable=False)
+    product_taken = db.Column(db.String(100), nullable=False)
+    amount = db.Column(db.Float, nullable=False)
+    phone_number = db.Column(db.String(20), nullable=False)
+    date_added = db.Column(db.DateTime, default=datetime.now)
+    # 0 = Unpaid, 1 = Paid
+    status = db.Column(db.Integer, default=0)
+    # Sum of the partial payments so far; status flips to 1 once it covers amount.
+    paid_amount = db.Column(db.Float, nullable=False, default=0, server_default='0')
+    
+    # Link to User (Owner)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    # The ledger account this loan is booked to (see Customer).
+    customer_id = db.Column(db.Integer, db.ForeignKey('customer.id'))
+
+    __table_args__ = (
+        # loans(): filter_by(status, user_id).order_by(date_added.desc())
+        db.Index('ix_loan_user_status_date', 'user_id', 'status', 'date_added'),
+        # shop_loans(): every loan of a shop, newest first
+        db.Index('ix_loan_user_date', 'user_id', 'date_added'),
+        # customer_loans(): one customer's loans, newest first
+        db.Index('ix_loan_customer_date', 'customer_id', 'date_added'),
+    )
+
+    @property
+    def owed(self):
+        return round(self.amount - (self.paid_amount or 0), 2)
+
+    def book(self):
+        """Book a loan that isn't on the ledger yet to its customer's account.
+
+        Posts the loan and anything already paid on it, so the balance
+        matches as if it had been booked when it was made. The caller commits.
+        """
+        phone = normalize_phone(self.phone_number) or self.phone_number.strip()
+        self.customer_id = Customer.for_phone(self.user_id, phone, self.customer_name)
+        Customer.post(self.customer_id, amount=self.amount, kind='loan', loan_id=self.id)
+        if self.paid_amount:
+            Customer.post(self.customer_id, amount=-self.paid_amount, kind='payment', loan_id=self.id)
+
+    @classmethod
+    def pay(cls, loan_id, user_id, amount=None):
+        """Book a payment of amount (everything still owed if None) on an unpaid loan.
+
+        Updates the loan and posts the matching ledger entry, so the
+        customer's balance moves in the same transaction. The UPDATE only
+        matches if paid_amount is still what was read, so two payments
+        racing on one loan cannot both apply. Returns the loan, or None if
+        it isn't this user's unpaid loan; raises ValueError for a bad amount
+        or a lost race. The caller commits.
+        """
+        loan = cls.query.filter_by(id=loan_id, user_id=user_id, status=0).first()
+        if loan is None:
+            return None
+        if loan.customer_id is None:
+            # Added behind the app's back (imports, bulk loads); book it now.
+            loan.book()
+        owed = loan.owed
+        amount = owed if amount is None else round(amount, 2)
+        if not amount > 0:
+            raise ValueError("Please enter a valid amount.")
+        if amount > owed:
+            raise ValueError(f"Only PKR {owed:.2f} is still owed on this loan.")
+        paid = round(loan.paid_amount + amount, 2)
+        matched = db.session.execute(
+            db.update(cls)
+            .where(cls.id == loan.id, cls.status == 0, cls.paid_amount == loan.paid_amount)
+            .values(paid_amount=paid, status=1 if paid >= loan.amount else 0)
+            .execution_options(synchronize_session='fetch')
+        ).rowcount
+        if not matched:
+            raise ValueError("This loan was just updated. Please try again.")
+        Customer.post(loan.customer_id, amount=-amount, kind='payment', loan_id=loan.id)
+        return loan
+
+class Customer(db.Model):
+    """A shop's credit customer, identified by normalized phone number.
+
+    balance is what the customer owes right now. It always equals the sum of
+    their ledger entries and only moves through Customer.post(), in the same
+    transaction as the entry. Rebuild it with `flask reconcile-ledger`.
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    phone = db.Column(db.String(20), nullable=False)   # normalize_phone()
+    name = db.Column(db.String(100), nullable=False)   # latest name given
+    balance = db.Column(db.Float, nullable=False, default=0, server_default='0')
+    updated_at = db.Column(db.DateTime, default=datetime.now)
+
+    __table_args__ = (
+        # customer_balance(): one probe of the shop's phone number
+        db.Index('ux_customer_user_phone', 'user_id', 'phone', unique=True),
+        # top_debtors() and unpaid_summary(): the shop's slice, by balance
+        db.Index('ix_customer_user_balance', 'user_id', 'balance'),
+    )
+
+    @classmethod
+    def for_phone(cls, user_id, phone, name):
+        """Id of the shop's customer with this (normalized) phone, created if new."""
+        stmt = _dialect_insert()(cls).values(
+            user_id=user_id, phone=phone, name=name, balance=0, updated_at=datetime.now())
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[cls.user_id, cls.phone], set_={'name': name})
+        db.session.execute(stmt)
+        return db.session.scalar(db.select(cls.id).filter_by(user_id=user_id, phone=phone))
+
+    @classmethod
+    def post(cls, customer_id, amount, kind, loan_id=None):
+        """Add a ledger entry and move the customer's balance by amount. The caller commits.
+
+        Amounts are whole paisa, so the balance is rounded to 2 places on
+        every move; otherwise float residue (0.1 + 0.2 - 0.3) would leave a
+        paid-up customer owing 2.8e-17 and listed among the debtors.
+        """
+        now = datetime.now()
+        amount = round(amount, 2)
+        db.session.add(LedgerEntry(customer_id=customer_id, loan_id=loan_id, amount=amount,
+                                   kind=kind, created_at=now))
+        db.session.execute(
+            db.update(cls).where(cls.id == customer_id)
+            .values(balance=func.round(cls.balance + amount, 2), updated_at=now)
+            .execution_options(synchronize_session=False)
+        )
+
+class LedgerEntry(db.Model):
+    """One movement on a customer's account.
+
+    kind is 'loan' (credit given, positive), 'payment' (negative) or
+    'writeoff' (negative; the rest of a deleted unpaid loan).
+    """
+    __tablename__ = 'ledger_entry'
+
+    id = db.Column(db.Integer, primary_key=True)
+    customer_id = db.Column(db.Integer, db.ForeignKey('customer.id'), nullable=False)
+    loan_id = db.Column(db.Integer, db.ForeignKey('loan.id'))
+    amount = db.Column(db.Float, nullable=False)
+    kind = db.Column(db.String(10), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.now)
+
+    __table_args__ = (
+        # customer_ledger(): one customer's entries, newest first
+        db.Index('ix_ledger_customer_date', 'customer_id', 'created_at'),
+        db.Index('ix_ledger_loan', 'loan_id'),
+    )
+
+class Rate(db.Model):
+    """One market rate on the public rates board (newest id shown first)."""
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+    price = db.Column(db.Float, nullable=False)
+    unit = db.Column(db.String(50), nullable=False)
+    category = db.Column(db.String(50), nullable=False, default='other')
+    trend = db.Column(db.String(20), nullable=False, default='stable')
+    date_added = db.Column(db.Date, default=date.today)
+
+    __table_args__ = (
+        # rates_page(): optional category filter, newest (highest id) first
+        db.Index('ix_rate_category_id', 'category', 'id'),
+    )
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'name': self.name,
+            'price': self.price,
+            'unit': self.unit,
+            'category': self.category,
+            'trend': self.trend,
+            'date': self.date_added.strftime('%Y-%m-%d') if self.date_added else None,
+        }
+
+class DataVersion(db.Model):
+    """A counter bumped in the same transaction as every write to some data set.
+
+    Readers use (version, updated_at) as a cheap change marker for ETags and
+    caches instead of scanning the data itself.
+    """
+    __tablename__ = 'data_version'
+
+    key = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        # changed_users(): keys bumped since the last poll
+        db.Index('ix_data_version_updated', 'updated_at'),
+    )
+
+    @classmethod
+    def bump(cls, key):
+        now = datetime.utcnow().replace(microsecond=0)
+        stmt = _dialect_insert()(cls).values(key=key, version=1, updated_at=now)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[cls.key],
+            set_={'version': cls.version + 1, 'updated_at': now},
+        )
+        db.session.execute(stmt)
+
+    @classmethod
+    def current(cls, key):
+        """(version, updated_at) for key; (0, None) if it was never written."""
+        row = db.session.get(cls, key)
+        return (row.version, row.updated_at) if row else (0, None)
+
+def user_version_key(user_id):
+    """DataVersion key bumped whenever a user is deactivated, deleted or re-passworded."""
+    return f'user:{user_id}'
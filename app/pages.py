@@ -0,0 +1,16 @@
+"""Static public pages."""
+from flask import Blueprint, render_template, request
+
+from .caching import cached_page
+
+pages_bp = Blueprint('pages', __name__)
+
+@pages_bp.route('/about')
+def about():
+    return cached_page('about.html')
+
+@pages_bp.route('/clinic', methods=['GET', 'POST'])
+def clinic():
+    if request.method != 'GET':
+        return render_template('ZahraClinic.html')
+    return cached_page('ZahraClinic.html')
@@ -0,0 +1,132 @@
+"""Opt-in per-request SQL and template timing."""
+import os
+import threading
+import time
+from collections import deque
+
+from flask import before_render_template, template_rendered, current_app, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from .config import env_int
+
+# Opt-in with PROFILE_REQUESTS=1. Every request then carries a Server-Timing
+# header (SQL time and count, template time, total), requests slower than
+# SLOW_REQUEST_MS are logged with their slowest statements, and per-route
+# numbers are kept in memory for /admin/slow_routes.
+PROFILE_REQUESTS = os.environ.get('PROFILE_REQUESTS', '').lower() in ('1', 'true', 'yes')
+SLOW_REQUEST_MS = env_int('SLOW_REQUEST_MS', 500)
+PROFILE_SLOWEST_STATEMENTS = 3
+
+class RouteStats:
+    """Thread-safe per-endpoint latency, SQL count and SQL time totals."""
+
+    def __init__(self, window=200):
+        self.window = window
+        self._routes = {}
+        self._lock = threading.Lock()
+
+    def record(self, endpoint, total_ms, queries, sql_ms):
+        with self._lock:
+            route = self._routes.get(endpoint)
+            if route is None:
+                route = self._routes[endpoint] = {
+                    'count': 0, 'total_ms': 0.0, 'max_ms': 0.0,
+                    'queries': 0, 'sql_ms': 0.0, 'recent': deque(maxlen=self.window),
+                }
+            route['count'] += 1
+            route['total_ms'] += total_ms
+            route['max_ms'] = max(route['max_ms'], total_ms)
+            route['queries'] += queries
+            route['sql_ms'] += sql_ms
+            route['recent'].append(total_ms)
+
+    def slowest(self, limit=None):
+        """Routes ordered by p95 latency over their recent requests."""
+        with self._lock:
+            rows = []
+            for endpoint, route in self._routes.items():
+                recent = sorted(route['recent'])
+                count = route['count']
+                rows.append({
+                    'endpoint': endpoint,
+                    'count': count,
+                    'avg_ms': route['total_ms'] / count,
+                    'p95_ms': recent[max(0, int(len(recent) * 0.95 + 0.5) - 1)],
+                    'max_ms': route['max_ms'],
+                    'avg_queries': route['queries'] / count,
+                    'avg_sql_ms': route['sql_ms'] / count,
+                })
+        rows.sort(key=lambda row: row['p95_ms'], reverse=True)
+        return rows[:limit] if limit else rows
+
+    def clear(self):
+        with self._lock:
+            self._routes.clear()
+
+route_stats = RouteStats()
+
+def _profile():
+    return g.get('profile') if has_request_context() else None
+
+if PROFILE_REQUESTS:
+    @event.listens_for(Engine, 'before_cursor_execute')
+    def _profile_query_start(conn, cursor, statement, parameters, context, executemany):
+        # On the execution context, not the connection: a statement that
+        # raises never reaches after_cursor_execute, and its start time must
+        # not linger on a pooled connection.
+        if context is not None:
+            context._profile_query_start = time.perf_counter()
+
+    @event.listens_for(Engine, 'after_cursor_execute')
+    def _profile_query_end(conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, '_profile_query_start', None)
+        if started is None:
+            return
+        elapsed = (time.perf_counter() - started) * 1000
+        profile = _profile()
+        if profile is not None:
+            profile['queries'] += 1
+            profile['sql_ms'] += elapsed
+            profile['statements'].append((elapsed, statement))
+
+    @before_render_template.connect
+    def _profile_template_start(sender, template, context, **extra):
+        profile = _profile()
+        if profile is not None:
+            profile['template_start'].append(time.perf_counter())
+
+    @template_rendered.connect
+    def _profile_template_end(sender, template, context, **extra):
+        profile = _profile()
+        if profile is not None and profile['template_start']:
+            profile['template_ms'] += (time.perf_counter() - profile['template_start'].pop()) * 1000
+
+# Request hooks, registered app-wide by create_app() when PROFILE_REQUESTS is on.
+def profile_request_start():
+    g.profile = {
+        'start': time.perf_counter(), 'queries': 0, 'sql_ms': 0.0,
+        'statements': [], 'template_start': [], 'template_ms': 0.0,
+    }
+
+def profile_request_end(response):
+    profile = g.pop('profile', None)
+    if profile is None:
+        return response
+    total_ms = (time.perf_counter() - profile['start']) * 1000
+    response.headers.add('Server-Timing', (
+        f'sql;dur={profile["sql_ms"]:.1f};desc="{profile["queries"]} queries", '
+        f'tpl;dur={profile["template_ms"]:.1f};desc="templates", '
+        f'total;dur={total_ms:.1f}'
+    ))
+    endpoint = request.endpoint or request.path
+    route_stats.record(endpoint, total_ms, profile['queries'], profile['sql_ms'])
+    if total_ms >= SLOW_REQUEST_MS:
+        slowest = sorted(profile['statements'], reverse=True)[:PROFILE_SLOWEST_STATEMENTS]
+        current_app.logger.warning(
+            "Slow request %s %s: %.0fms total, %d queries in %.0fms, templates %.0fms%s",
+            request.method, request.path, total_ms, profile['queries'], profile['sql_ms'],
+            profile['template_ms'],
+            ''.join(f"\n    {ms:.1f}ms {' '.join(sql.split())[:300]}" for ms, sql in slowest),
+        )
+    return response
@@ -0,0 +1,323 @@
+"""Read paths shared by the views, reports and maintenance commands."""
+import re
+from collections import namedtuple
+from datetime import datetime, date
+
+from flask import request
+from sqlalchemy import event, func, text, tuple_
+from sqlalchemy.orm import raiseload
+
+from .caching import admin_stats_cache, invalidate_on_commit
+from .config import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, RATES_PER_PAGE, SEARCH_RESULTS
+from .extensions import db
+from .models import Customer, DailySales, DataVersion, LedgerEntry, Loan, Product, Rate, Sale, User
+from .validation import normalize_phone
+
+def product_listing(user_id):
+    """All of a shop's products, newest first, in a single SELECT.
+
+    Sold/remaining/revenue/profit come from the counter columns on the row
+    itself, and Product.sales is raiseload'ed so a template can never slip
+    back into one lazy SELECT per product.
+    """
+    return (
+        Product.query
+        .options(raiseload(Product.sales))
+        .filter_by(user_id=user_id)
+        .order_by(Product.date_added.desc(), Product.id.desc())
+        .all()
+    )
+
+Page = namedtuple('Page', 'items next_cursor')
+
+def page_size():
+    """?per_page= from the request, clamped to 1..MAX_PAGE_SIZE."""
+    return min(max(request.args.get('per_page', DEFAULT_PAGE_SIZE, type=int), 1), MAX_PAGE_SIZE)
+
+def encode_cursor(values):
+    return '_'.join(v.isoformat() if hasattr(v, 'isoformat') else str(v) for v in values)
+
+def decode_cursor(columns, cursor):
+    """Turn a cursor back into typed column values; None if it is malformed."""
+    parts = (cursor or '').split('_')
+    if len(parts) != len(columns):
+        return None
+    values = []
+    try:
+        for column, raw in zip(columns, parts):
+            python_type = column.type.python_type
+            if python_type in (date, datetime):
+                values.append(python_type.fromisoformat(raw))
+            else:
+                values.append(python_type(raw))
+    except (ValueError, NotImplementedError):
+        return None
+    return values
+
+def keyset_page(query, columns, cursor, per_page, descending=True):
+    """One page of query ordered by columns, starting after cursor.
+
+    Uses a row-value comparison on the sort key instead of OFFSET, so with
+    a matching index every page costs the same no matter how deep it is.
+    """
+    key = tuple_(*columns) if len(columns) > 1 else columns[0]
+    values = decode_cursor(columns, cursor) if cursor else None
+    if values is not None:
+        bound = tuple_(*values) if len(values) > 1 else values[0]
+        query = query.filter(key < bound if descending else key > bound)
+    order = [c.desc() if descending else c.asc() for c in columns]
+    rows = query.order_by(*order).limit(per_page + 1).all()
+    items = rows[:per_page]
+    next_cursor = None
+    if len(rows) > per_page:
+        next_cursor = encode_cursor([getattr(items[-1], c.key) for c in columns])
+    return Page(items, next_cursor)
+
+def product_page(user_id, cursor=None, per_page=DEFAULT_PAGE_SIZE):
+    query = Product.query.options(raiseload(Product.sales)).filter_by(user_id=user_id)
+    return keyset_page(query, [Product.date_added, Product.id], cursor, per_page)
+
+def product_page_cursor(date_added, product_id):
+    """Cursor for the product_page() that starts with this product."""
+    return encode_cursor([date_added, product_id + 1])
+
+def unpaid_loans(user_id, cursor=None, per_page=DEFAULT_PAGE_SIZE):
+    query = Loan.query.filter_by(status=0, user_id=user_id)
+    return keyset_page(query, [Loan.date_added, Loan.id], cursor, per_page)
+
+def unpaid_summary(user_id):
+    """(number of unpaid loans, total outstanding) for a shop.
+
+    The total is the sum of the maintained customer balances, so partial
+    payments are already taken off.
+    """
+    count = (
+        db.session.query(func.count(Loan.id))
+        .filter(Loan.status == 0, Loan.user_id == user_id)
+        .scalar_subquery()
+    )
+    total = (
+        db.session.query(func.coalesce(func.sum(Customer.balance), 0))
+        .filter(Customer.user_id == user_id, Customer.balance > 0)
+        .scalar_subquery()
+    )
+    return db.session.query(count, total).one()
+
+def top_debtors(user_id, limit=10):
+    """The shop's customers who owe the most, largest balance first."""
+    return (
+        Customer.query.filter(Customer.user_id == user_id, Customer.balance > 0)
+        .order_by(Customer.balance.desc()).limit(limit).all()
+    )
+
+def customer_balance(user_id, phone):
+    """The shop's customer with this phone number (any format), or None."""
+    return Customer.query.filter_by(user_id=user_id, phone=normalize_phone(phone)).first()
+
+def customer_ledger(customer_id, limit=50):
+    return (
+        LedgerEntry.query.filter_by(customer_id=customer_id)
+        .order_by(LedgerEntry.created_at.desc(), LedgerEntry.id.desc()).limit(limit).all()
+    )
+
+def customer_loans(customer_id, limit=50):
+    return (
+        Loan.query.filter_by(customer_id=customer_id)
+        .order_by(Loan.date_added.desc()).limit(limit).all()
+    )
+
+def search_products(user_id, q, limit=SEARCH_RESULTS):
+    """Best-matching products of one shop for a type-ahead query.
+
+    Every word of q is treated as a prefix ("bas ri" finds "Basmati Rice").
+    SQLite answers from the FTS5 index ranked by bm25; other databases fall
+    back to a case-insensitive LIKE per word on the shop's products.
+    """
+    terms = re.findall(r'\w+', q or '')
+    if not terms:
+        return []
+    if db.engine.dialect.name == 'sqlite':
+        match = f'user_id:"{int(user_id)}" AND ' + ' AND '.join(f'name:"{t}"*' for t in terms)
+        return db.session.execute(text(
+            "SELECT product.id, product.name, product.quantity - product.items_sold AS remaining, "
+            "product.sale_price, product.date_added FROM product_fts JOIN product ON product.id = product_fts.rowid "
+            "WHERE product_fts MATCH :match ORDER BY product_fts.rank LIMIT :limit"
+        ).columns(date_added=db.Date), {'match': match, 'limit': limit}).all()
+    query = db.session.query(
+        Product.id, Product.name, (Product.quantity - Product.items_sold).label('remaining'), Product.sale_price,
+        Product.date_added,
+    ).filter(Product.user_id == user_id)
+    for term in terms:
+        query = query.filter(Product.name.ilike(f'%{term}%'))
+    return query.order_by(Product.name).limit(limit).all()
+
+def loan_history(user_id, limit=10):
+    return Loan.query.filter_by(status=1, user_id=user_id).order_by(Loan.date_added.desc()).limit(limit).all()
+
+def shop_loans(user_id, cursor=None, per_page=DEFAULT_PAGE_SIZE):
+    query = Loan.query.filter_by(user_id=user_id)
+    return keyset_page(query, [Loan.date_added, Loan.id], cursor, per_page)
+
+def user_page(cursor=None, per_page=DEFAULT_PAGE_SIZE):
+    return keyset_page(User.query, [User.id], cursor, per_page, descending=False)
+
+def rates_page(category, page, per_page):
+    """One page of rates, newest first; returns (rates, has_next)."""
+    query = Rate.query
+    if category:
+        query = query.filter_by(category=category)
+    rows = query.order_by(Rate.id.desc()).offset((page - 1) * per_page).limit(per_page + 1).all()
+    return rows[:per_page], len(rows) > per_page
+
+def changed_users(since):
+    """Ids of users whose DataVersion was bumped at or after since (UTC)."""
+    keys = db.session.scalars(
+        db.select(DataVersion.key)
+        .where(DataVersion.updated_at >= since, DataVersion.key.startswith('user:'))
+    )
+    return [int(key.split(':', 1)[1]) for key in keys]
+
+def overdue_loans(user_id, cutoff, cursor=None, per_page=DEFAULT_PAGE_SIZE):
+    """Unpaid loans taken before cutoff, oldest first, one keyset batch at a time."""
+    query = Loan.query.filter(Loan.user_id == user_id, Loan.status == 0, Loan.date_added < cutoff)
+    return keyset_page(query, [Loan.date_added, Loan.id], cursor, per_page, descending=False)
+
+# --- ANALYTICS ---
+
+def sales_analytics(user_id, start, end):
+    """Date-range totals for one shop, aggregated by the database.
+
+    One GROUP BY over the daily_sales rollup yields a row per product sold in
+    the range, so both the rows read and the memory used scale with products
+    x days, never with the number of sales. Returns None when nothing sold.
+    """
+    rows = (
+        db.session.query(
+            DailySales.product_id.label('id'),
+            func.sum(DailySales.units).label('sold'),
+            func.sum(DailySales.revenue).label('revenue'),
+            func.sum(DailySales.profit).label('profit'),
+        )
+        .filter(DailySales.user_id == user_id, DailySales.day.between(start, end))
+        .group_by(DailySales.product_id)
+        .having(func.sum(DailySales.units) > 0)
+        .all()
+    )
+    if not rows:
+        return None
+
+    best_seller = max(rows, key=lambda r: r.sold)
+    best_profit = max(rows, key=lambda r: r.profit)
+    highest_margin = (
+        Product.query
+        .filter_by(user_id=user_id)
+        .order_by((Product.sale_price - Product.purchase_price).desc(), Product.id)
+        .first()
+    )
+    return {
+        'total_sold': sum(r.sold for r in rows),
+        'total_revenue': sum(r.revenue for r in rows),
+        'net_profit': sum(r.profit for r in rows),
+        'best_seller': db.session.get(Product, best_seller.id),
+        'most_profitable': db.session.get(Product, best_profit.id),
+        'highest_margin': highest_margin,
+    }
+
+def admin_stats():
+    """Every admin dashboard figure in one statement, served from a TTL cache.
+
+    Revenue and profit come from the per-product counter columns, so the
+    sums read one row per product rather than every sale.
+    """
+    def compute():
+        row = db.session.execute(db.select(
+            db.select(func.count()).select_from(User).scalar_subquery(),
+            db.select(func.count()).select_from(Product).scalar_subquery(),
+            db.select(func.count()).select_from(Sale).scalar_subquery(),
+            db.select(func.count()).select_from(Loan).scalar_subquery(),
+            db.select(func.coalesce(func.sum(Product.total_revenue), 0)).scalar_subquery(),
+            db.select(func.coalesce(func.sum(Product.total_profit_generated), 0)).scalar_subquery(),
+        )).one()
+        return {
+            'users_count': row[0],
+            'products_count': row[1],
+            'total_sales_count': row[2],
+            'total_loans_count': row[3],
+            'total_revenue': row[4],
+            'total_profit': row[5],
+        }
+    return admin_stats_cache.get_or_set('global', compute)
+
+invalidate_on_commit(admin_stats_cache, [User, Product, Sale, Loan])
+
+# --- QUERY PLAN CHECKS ---
+
+def collect_query_plans():
+    """EXPLAIN QUERY PLAN every statement the hot request paths issue.
+
+    Runs the data-access helpers and the sale-recording path against a
+    throwaway shop inside a transaction that is rolled back, so it is safe
+    on a live database. Returns a list of (sql, [plan lines]) pairs.
+    """
+    captured = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if not executemany and statement.lstrip().upper().startswith(('SELECT', 'UPDATE', 'DELETE', 'INSERT')):
+            captured.append((statement, parameters))
+
+    user = User(username='__plan_check__', email='__plan_check__', password_hash='-')
+    db.session.add(user)
+    db.session.flush()
+    product = Product(name='plan', quantity=10, purchase_price=1, sale_price=2, user_id=user.id)
+    db.session.add_all([
+        product,
+        Loan(customer_name='plan', product_taken='plan', amount=1, phone_number='0', user_id=user.id),
+    ])
+    db.session.flush()
+
+    event.listen(db.engine, 'before_cursor_execute', capture)
+    try:
+        today = date.today()
+        Product.sell(product.id, user.id, 1)
+        db.session.flush()
+        product_listing(user.id)
+        sales_analytics(user.id, today, today)
+        cursor = encode_cursor([datetime.now(), 1])
+        product_page(user.id, encode_cursor([today, 1]))
+        unpaid_loans(user.id, cursor)
+        unpaid_summary(user.id)
+        loan_history(user.id)
+        shop_loans(user.id, cursor)
+        user_page('1')
+        changed_users(datetime.utcnow())
+        rates_page('vegetables', 1, RATES_PER_PAGE)
+        search_products(user.id, 'pla')
+        Loan.query.filter_by(id=1, user_id=user.id).first()
+        customer_id = Customer.for_phone(user.id, '920', 'plan')
+        Customer.post(customer_id, amount=1, kind='loan')
+        db.session.flush()
+        top_debtors(user.id)
+        customer_balance(user.id, '0')
+        customer_ledger(customer_id)
+        customer_loans(customer_id)
+        overdue_loans(user.id, datetime.now(), cursor)
+        DailySales.query.filter_by(product_id=product.id).delete()
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', capture)
+
+    conn = db.session.connection()
+    plans = []
+    for statement, parameters in captured:
+        rows = conn.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters).fetchall()
+        plans.append((statement, [row[-1] for row in rows]))
+    db.session.rollback()
+    return plans
+
+def full_scans(plans):
+    """The (sql, plan line) pairs that read a whole table without an index."""
+    return [
+        (statement, line)
+        for statement, lines in plans
+        for line in lines
+        if re.match(r'SCAN \w+$', line) or re.match(r'SCAN TABLE \w+$', line)
+    ]
@@ -0,0 +1,92 @@
+"""The public market rates board and its JSON API."""
+from flask import Blueprint, current_app, flash, jsonify, redirect, request, url_for
+from flask_login import login_required
+
+from .caching import cached_page
+from .config import MAX_RATES_PER_PAGE, RATES_PER_PAGE
+from .extensions import db
+from .models import DataVersion, Rate
+from .queries import rates_page
+
+rates_bp = Blueprint('rates', __name__)
+
+@rates_bp.route('/rates')
+def rates():
+    return cached_page('rates.html')
+
+@rates_bp.route('/add_rate', methods=['POST'])
+@login_required
+def add_rate():
+    try:
+        # 1. Get data from form
+        new_rate = Rate(
+            name=request.form.get('name'),
+            price=float(request.form.get('price')), # Convert to float/int
+            unit=request.form.get('unit'),
+            category=request.form.get('category') or 'other',
+            trend=request.form.get('trend') or 'stable',
+        )
+        # 2. A single-row INSERT: atomic, and nothing else is rewritten.
+        db.session.add(new_rate)
+        DataVersion.bump('rates')
+        db.session.commit()
+        
+        flash("Rate added successfully!", "success")
+    except Exception as e:
+        db.session.rollback()
+        flash(f"Error saving rate: {e}", "error")
+
+    return redirect(url_for('rates.rates'))
+
+@rates_bp.route('/delete_rate/<int:id>')
+@login_required
+def delete_rate(id):
+    # Rates are addressed by their stable id, so a delete can never hit a
+    # different row because the list changed in the meantime.
+    deleted = Rate.query.filter_by(id=id).delete()
+    if deleted:
+        DataVersion.bump('rates')
+    db.session.commit()
+    if deleted:
+        flash("Rate deleted successfully!", "info")
+    else:
+        flash("Error: Rate not found.", "error")
+
+    return redirect(url_for('rates.rates'))
+
+@rates_bp.route('/api/rates')
+def rates_api():
+    """Rates as JSON, filterable by ?category= and paged with ?page=&per_page=.
+
+    Carries an ETag and Last-Modified derived from the rates data version, so
+    a client revalidating an unchanged slice gets an empty 304.
+    """
+    category = (request.args.get('category') or '').lower() or None
+    if category == 'all':
+        category = None
+    page = max(request.args.get('page', 1, type=int), 1)
+    per_page = min(max(request.args.get('per_page', RATES_PER_PAGE, type=int), 1), MAX_RATES_PER_PAGE)
+
+    version, updated_at = DataVersion.current('rates')
+    etag = f"rates-{version}-{category or 'all'}-{page}-{per_page}"
+    if request.if_none_match.contains(etag) or (
+        updated_at and not request.if_none_match
+        and request.if_modified_since and request.if_modified_since.replace(tzinfo=None) >= updated_at
+    ):
+        response = current_app.response_class(status=304)
+    else:
+        items, has_next = rates_page(category, page, per_page)
+        response = jsonify({
+            'items': [rate.to_dict() for rate in items],
+            'page': page,
+            'per_page': per_page,
+            'category': category or 'all',
+            'has_next': has_next,
+        })
+    response.set_etag(etag)
+    if updated_at:
+        response.last_modified = updated_at
+    # Shared caches may keep it, but must revalidate (cheaply) on every use.
+    response.cache_control.public = True
+    response.cache_control.no_cache = True
+    return response
@@ -0,0 +1,238 @@
+"""Creating, upgrading and rebuilding the schema and its derived data."""
+import json
+import os
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import func, text, inspect as sa_inspect
+
+from .extensions import db
+from .models import Customer, DailySales, DataVersion, LedgerEntry, Loan, Product, Rate, Sale
+from .validation import normalize_phone
+
+def add_missing_columns():
+    """ALTER existing tables so they carry every column the models declare.
+
+    db.create_all() only creates missing tables, so databases created before a
+    column was added (e.g. the Product sales counters) need this.
+    Returns the list of "table.column" names that were added.
+    """
+    inspector = sa_inspect(db.engine)
+    existing_tables = set(inspector.get_table_names())
+    added = []
+    for table in db.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        present = {c['name'] for c in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in present:
+                continue
+            col_type = column.type.compile(dialect=db.engine.dialect)
+            ddl = f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {col_type}'
+            if column.server_default is not None:
+                ddl += f" NOT NULL DEFAULT {column.server_default.arg}"
+            with db.engine.begin() as conn:
+                conn.execute(text(ddl))
+            added.append(f"{table.name}.{column.name}")
+    return added
+
+def create_missing_indexes():
+    """Create any model-declared index the database doesn't have yet.
+
+    db.create_all() only builds indexes together with brand new tables, so
+    existing shop.db files pick up new indexes here. Returns their names.
+    """
+    existing_tables = set(sa_inspect(db.engine).get_table_names())
+    created = []
+    for table in db.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        present = {ix['name'] for ix in sa_inspect(db.engine).get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in present:
+                index.create(db.engine)
+                created.append(index.name)
+    return created
+
+def import_rates_json(json_path):
+    """Copy the legacy static/rates.json list into the rate table.
+
+    The file is newest-first, so it is inserted in reverse to keep that order
+    under ORDER BY id DESC. Returns the number of rates imported.
+    """
+    if not os.path.exists(json_path):
+        return 0
+    with open(json_path, 'r') as f:
+        rates_list = json.load(f)
+    for entry in reversed(rates_list):
+        entry_date = entry.get('date')
+        db.session.add(Rate(
+            name=entry.get('name') or '',
+            price=float(entry.get('price') or 0),
+            unit=entry.get('unit') or '',
+            category=entry.get('category') or 'other',
+            trend=entry.get('trend') or 'stable',
+            date_added=datetime.strptime(entry_date, '%Y-%m-%d').date() if entry_date else None,
+        ))
+    DataVersion.bump('rates')
+    db.session.commit()
+    return len(rates_list)
+
+# Full-text index over product names for the products page search box.
+# External-content FTS5 table: it stores only the index and reads names back
+# from product, while triggers keep it in step with every insert/rename/delete.
+# user_id is indexed too so a MATCH is scoped to one shop inside the index.
+PRODUCT_SEARCH_DDL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS product_fts USING fts5(
+        name, user_id, content='product', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3')""",
+    """CREATE TRIGGER IF NOT EXISTS product_fts_ai AFTER INSERT ON product BEGIN
+        INSERT INTO product_fts(rowid, name, user_id) VALUES (new.id, new.name, new.user_id);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS product_fts_ad AFTER DELETE ON product BEGIN
+        INSERT INTO product_fts(product_fts, rowid, name, user_id) VALUES ('delete', old.id, old.name, old.user_id);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS product_fts_au AFTER UPDATE OF name, user_id ON product BEGIN
+        INSERT INTO product_fts(product_fts, rowid, name, user_id) VALUES ('delete', old.id, old.name, old.user_id);
+        INSERT INTO product_fts(rowid, name, user_id) VALUES (new.id, new.name, new.user_id);
+    END""",
+]
+
+def ensure_product_search():
+    """Create the product name FTS5 index (SQLite only).
+
+    Returns True when the index was created just now and still needs
+    filling with rebuild_product_search().
+    """
+    if db.engine.dialect.name != 'sqlite':
+        return False
+    created = not sa_inspect(db.engine).has_table('product_fts')
+    with db.engine.begin() as conn:
+        for ddl in PRODUCT_SEARCH_DDL:
+            conn.execute(text(ddl))
+    return created
+
+def rebuild_product_search():
+    with db.engine.begin() as conn:
+        conn.execute(text("INSERT INTO product_fts(product_fts) VALUES ('rebuild')"))
+
+def reconcile_stock_counters():
+    """Rebuild Product.items_sold / total_revenue / total_profit_generated from the sale table."""
+    sold = (
+        db.session.query(func.coalesce(func.sum(Sale.quantity_sold), 0))
+        .filter(Sale.product_id == Product.id)
+        .scalar_subquery()
+    )
+    db.session.execute(
+        db.update(Product).values(
+            items_sold=sold,
+            total_revenue=sold * Product.sale_price,
+            total_profit_generated=sold * (Product.sale_price - Product.purchase_price),
+        )
+    )
+    db.session.commit()
+
+def rebuild_daily_rollup():
+    """Recompute the daily_sales rollup from the sale table."""
+    db.session.query(DailySales).delete()
+    units = func.sum(Sale.quantity_sold)
+    revenue = func.sum(Sale.quantity_sold * Product.sale_price)
+    cost = func.sum(Sale.quantity_sold * Product.purchase_price)
+    rollup = (
+        db.select(
+            Sale.product_id, Sale.sale_date, Product.user_id,
+            units, revenue, cost, revenue - cost,
+        )
+        .join(Product, Sale.product_id == Product.id)
+        .where(Sale.sale_date.isnot(None))
+        .group_by(Sale.product_id, Sale.sale_date, Product.user_id)
+    )
+    db.session.execute(
+        db.insert(DailySales).from_select(
+            ['product_id', 'day', 'user_id', 'units', 'revenue', 'cost', 'profit'],
+            rollup,
+        )
+    )
+    db.session.commit()
+
+def backfill_customer_ledger():
+    """Book loans that predate the customer ledger to customers.
+
+    Groups each shop's loans by normalized phone number, posts a 'loan'
+    entry for every loan and a 'payment' entry for the ones already paid,
+    then recomputes the balances. Returns the number of loans booked.
+    """
+    customers = {}
+    booked = 0
+    for loan in Loan.query.filter(Loan.customer_id.is_(None)).order_by(Loan.id).all():
+        phone = normalize_phone(loan.phone_number) or loan.phone_number.strip()
+        key = (loan.user_id, phone)
+        if key not in customers:
+            customers[key] = Customer.for_phone(loan.user_id, phone, loan.customer_name)
+        loan.customer_id = customers[key]
+        loan.paid_amount = loan.amount if loan.status == 1 else 0
+        db.session.add(LedgerEntry(customer_id=loan.customer_id, loan_id=loan.id, amount=loan.amount,
+                                   kind='loan', created_at=loan.date_added))
+        if loan.status == 1:
+            db.session.add(LedgerEntry(customer_id=loan.customer_id, loan_id=loan.id, amount=-loan.amount,
+                                       kind='payment', created_at=loan.date_added))
+        booked += 1
+    db.session.commit()
+    reconcile_customer_balances()
+    return booked
+
+def reconcile_customer_balances():
+    """Rebuild Customer.balance from the ledger_entry table."""
+    owed = (
+        db.session.query(func.coalesce(func.sum(LedgerEntry.amount), 0))
+        .filter(LedgerEntry.customer_id == Customer.id)
+        .scalar_subquery()
+    )
+    db.session.execute(db.update(Customer).values(balance=func.round(owed, 2)))
+    db.session.commit()
+
+def unbalanced_customers():
+    """(customer, balance, still owed on unpaid loans) wherever the two differ.
+
+    A customer whose loans are all paid must have a balance of exactly 0.
+    """
+    open_amount = (
+        db.session.query(func.coalesce(func.sum(Loan.amount - Loan.paid_amount), 0))
+        .filter(Loan.customer_id == Customer.id, Loan.status == 0)
+        .scalar_subquery()
+    )
+    open_amount = func.round(open_amount, 2).label('open_amount')
+    return (
+        db.session.query(Customer, Customer.balance, open_amount)
+        .filter(Customer.balance != open_amount)
+        .order_by(Customer.id)
+        .all()
+    )
+
+# Initialize Database
+def init_schema():
+    """Create or upgrade the schema: tables, columns, indexes, rollups, search.
+
+    Safe to run repeatedly. Run it once per deploy with `flask init-db`
+    rather than in every worker at startup.
+    """
+    had_rollup = sa_inspect(db.engine).has_table(DailySales.__tablename__)
+    had_rates = sa_inspect(db.engine).has_table(Rate.__tablename__)
+    had_ledger = sa_inspect(db.engine).has_table(Customer.__tablename__)
+    db.create_all()
+    create_missing_indexes()
+    if 'product.items_sold' in add_missing_columns():
+        # Fresh counter columns start at zero; fill them from existing sales.
+        # (Very old databases still carry a legacy items_sold column; those are
+        # left alone until migrate.py has turned it into Sale rows.)
+        reconcile_stock_counters()
+    if not had_rollup:
+        rebuild_daily_rollup()
+    if not had_ledger:
+        # Loans used to be loose rows; book the existing ones to customers once.
+        backfill_customer_ledger()
+    if ensure_product_search():
+        rebuild_product_search()
+    if not had_rates:
+        # Rates used to live in static/rates.json; bring them over once.
+        import_rates_json(os.path.join(current_app.root_path, 'static', 'rates.json'))
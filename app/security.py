@@ -0,0 +1,57 @@
+"""Password hashing on a bounded worker pool."""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from functools import lru_cache
+
+from werkzeug.security import generate_password_hash, check_password_hash
+
+from .config import env_int
+
+# Hash algorithm and cost come from the environment, e.g.
+#   PASSWORD_HASH_METHOD=scrypt:32768:8:1   or   pbkdf2:sha256:600000
+# Stored hashes made with a different method are upgraded at next login.
+PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt')
+PASSWORD_SALT_LENGTH = env_int('PASSWORD_SALT_LENGTH', 16)
+# Hashing is CPU-bound by design. It runs on a small dedicated pool so a
+# login burst can occupy at most HASH_WORKERS cores. Every caller waiting on
+# that pool also holds a request thread, so admission is capped below the
+# server's WEB_THREADS (see gunicorn.conf.py): at least one thread per worker
+# is always free for sales, and callers beyond the cap get a 503 at once.
+WEB_THREADS = env_int('WEB_THREADS', 4)
+HASH_WORKERS = env_int('HASH_WORKERS', 2)
+HASH_QUEUE = env_int('HASH_QUEUE', max(WEB_THREADS - 1 - HASH_WORKERS, 0))
+HASH_WAIT_SECONDS = env_int('HASH_WAIT_SECONDS', 10)
+HASH_ADMISSION = max(min(HASH_WORKERS + HASH_QUEUE, WEB_THREADS - 1), 1)
+
+_hash_pool = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix='pwhash')
+_hash_slots = threading.BoundedSemaphore(HASH_ADMISSION)
+
+class HashingBusy(Exception):
+    """Raised when the password hashing pool is saturated."""
+
+def _run_hashing(fn, *args):
+    if not _hash_slots.acquire(blocking=False):
+        raise HashingBusy()
+    try:
+        return _hash_pool.submit(fn, *args).result(timeout=HASH_WAIT_SECONDS)
+    except FutureTimeout:
+        raise HashingBusy()
+    finally:
+        _hash_slots.release()
+
+def hash_password(password):
+    return _run_hashing(generate_password_hash, password, PASSWORD_HASH_METHOD, PASSWORD_SALT_LENGTH)
+
+def verify_password(pwhash, password):
+    return _run_hashing(check_password_hash, pwhash, password)
+
+@lru_cache(maxsize=None)
+def _configured_hash_prefix():
+    # werkzeug expands bare names ("scrypt") into their full parameter
+    # string, so derive the canonical prefix from a real hash. That costs a
+    # full hash, so it is done on the first login rather than at import.
+    return generate_password_hash('', PASSWORD_HASH_METHOD, 1).split('$', 1)[0]
+
+def password_needs_rehash(pwhash):
+    return pwhash.split('$', 1)[0] != _configured_hash_prefix()
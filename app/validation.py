@@ -0,0 +1,32 @@
+"""Clean-up of user-entered fields shared by forms, imports and the ledger."""
+import re
+
+def clean_product_fields(name, p_price, s_price, qty):
+    """Validate and normalise one product's form/CSV fields.
+
+    Prices and stock are whole numbers; stray non-digit characters are
+    stripped just in case the browser-side check didn't run. Raises
+    ValueError with a user-facing message when the row can't be used.
+    """
+    # VALIDATION: Check if any field is empty
+    if not name or not p_price or not s_price or not qty:
+        raise ValueError("All fields are required.")
+    try:
+        # INTEGER CONVERSION (Fixes the "float" issue)
+        return {
+            'name': name,
+            'purchase_price': int(re.sub(r'[^0-9]', '', str(p_price))),
+            'sale_price': int(re.sub(r'[^0-9]', '', str(s_price))),
+            'quantity': int(re.sub(r'[^0-9]', '', str(qty))),  # This sets the initial stock
+        }
+    except ValueError:
+        raise ValueError("Invalid number format. Please enter whole numbers only.")
+
+def normalize_phone(phone):
+    """Digits only, in international form: "0300-1234567" -> "923001234567"."""
+    digits = ''.join(filter(str.isdigit, phone or ''))
+    if digits.startswith('00'):
+        digits = digits[2:]
+    elif digits.startswith('0'):
+        digits = '92' + digits[1:]
+    return digits
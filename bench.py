@@ -0,0 +1,241 @@
+"""Route-level benchmark on a synthetic shop database.
+
+Seeds a throwaway SQLite file with N users x M products x K sales x L loans
+(deterministic for a given --seed), then drives the main pages through the
+Flask test client and reports p50/p95 latency, SQL statements per request
+and peak Python memory per route.
+
+    python bench.py --users 5 --products 500 --sales 20 --loans 200
+    python bench.py --save baseline.json
+    python bench.py --compare baseline.json --tolerance 0.25
+
+With --compare the run exits 1 when a route's p95 latency grew by more than
+the tolerance or it issues more SQL statements than the baseline did.
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta
+
+ROUTES = [
+    # (label, method, path template, needs admin session)
+    ('dashboard', 'GET', '/', False),
+    ('products', 'GET', '/products', False),
+    ('loans', 'GET', '/loans', False),
+    ('update_sales', 'POST', '/update_sales/{product_id}', False),
+    ('admin_dashboard', 'GET', '/admin/dashboard', True),
+]
+
+
+def seed(db, User, Product, Sale, Loan, users, products, sales, loans, days, rng):
+    """Bulk-insert the synthetic shop data and return the benchmarked user's id."""
+    today = date.today()
+    user_ids = []
+    for u in range(users):
+        user = User(username=f'bench{u}', email=f'bench{u}@example.com')
+        user.set_password('bench')
+        db.session.add(user)
+        db.session.flush()
+        user_ids.append(user.id)
+
+    product_rows = []
+    for user_id in user_ids:
+        for p in range(products):
+            purchase = rng.randint(5, 500)
+            product_rows.append({
+                'name': f'Item {p} {rng.choice("ABCDEFGH")}',
+                'quantity': sales * 3 + 1_000_000,  # never runs out during the run
+                'purchase_price': purchase,
+                'sale_price': purchase + rng.randint(1, 100),
+                'date_added': today - timedelta(days=rng.randrange(days)),
+                'user_id': user_id,
+            })
+    db.session.execute(db.insert(Product), product_rows)
+
+    product_ids = db.session.scalars(db.select(Product.id).order_by(Product.id)).all()
+    sale_rows = []
+    for product_id in product_ids:
+        for _ in range(sales):
+            sale_rows.append({
+                'product_id': product_id,
+                'quantity_sold': rng.randint(1, 3),
+                'sale_date': today - timedelta(days=rng.randrange(days)),
+            })
+            if len(sale_rows) >= 10_000:
+                db.session.execute(db.insert(Sale), sale_rows)
+                sale_rows = []
+    if sale_rows:
+        db.session.execute(db.insert(Sale), sale_rows)
+
+    loan_rows = []
+    for user_id in user_ids:
+        for l in range(loans):
+            loan_rows.append({
+                'customer_name': f'Customer {rng.randrange(loans // 4 + 1)}',
+                'product_taken': f'Item {rng.randrange(products or 1)}',
+                'amount': rng.randint(10, 2000),
+                'phone_number': f'0300{rng.randrange(10**7):07d}',
+                'date_added': datetime.now() - timedelta(days=rng.randrange(days)),
+                'status': rng.randint(0, 1),
+                'user_id': user_id,
+            })
+    if loan_rows:
+        db.session.execute(db.insert(Loan), loan_rows)
+    db.session.commit()
+    return user_ids[0]
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def run(args):
+    # Point the app at a scratch database *before* importing it. A cheap
+    # hash keeps seeding fast; login cost is not what is measured here.
+    workdir = tempfile.mkdtemp(prefix='tuckshop-bench-')
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(workdir, 'bench.db')
+    os.environ.setdefault('FLASK_SECRET_KEY', 'bench')
+    os.environ.setdefault('PASSWORD_HASH_METHOD', 'pbkdf2:sha256:1000')
+
+    from sqlalchemy import event
+    from app import create_app
+    from app.caching import admin_stats_cache, user_cache
+    from app.extensions import db
+    from app.models import User, Product, Sale, Loan
+    from app.schema import (init_schema, reconcile_stock_counters, backfill_customer_ledger,
+                            rebuild_daily_rollup, rebuild_product_search, ensure_product_search)
+
+    app = create_app()
+    rng = random.Random(args.seed)
+    started = time.perf_counter()
+    with app.app_context():
+        init_schema()
+        user_id = seed(db, User, Product, Sale, Loan, args.users, args.products,
+                       args.sales, args.loans, args.days, rng)
+        reconcile_stock_counters()
+        rebuild_daily_rollup()
+        backfill_customer_ledger()
+        ensure_product_search()
+        if db.engine.dialect.name == 'sqlite':
+            rebuild_product_search()
+        product_id = db.session.scalar(
+            db.select(Product.id).filter_by(user_id=user_id).order_by(Product.id))
+        engine = db.engine
+    print(f"seeded {args.users} users x {args.products} products x {args.sales} sales "
+          f"x {args.loans} loans in {time.perf_counter() - started:.1f}s ({workdir})")
+
+    statements = [0]
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def count_statement(*_):
+        statements[0] += 1
+
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['_user_id'] = str(user_id)
+        sess['_fresh'] = True
+        sess['is_admin'] = True
+
+    results = {}
+    for label, method, template, _admin in ROUTES:
+        if args.routes and label not in args.routes:
+            continue
+        path = template.format(product_id=product_id)
+        kwargs = {'data': {'items_sold': '1'},
+                  'headers': {'X-Requested-With': 'XMLHttpRequest'}} if method == 'POST' else {}
+
+        def request():
+            if args.cold:
+                admin_stats_cache.clear()
+                user_cache.clear()
+            resp = client.open(path, method=method, **kwargs)
+            if resp.status_code != 200:
+                raise SystemExit(f"{label}: {method} {path} returned {resp.status_code}")
+            return resp
+
+        for _ in range(args.warmup):
+            request()
+
+        timings, queries = [], []
+        tracemalloc.start()
+        for _ in range(args.repeat):
+            statements[0] = 0
+            t0 = time.perf_counter()
+            request()
+            timings.append((time.perf_counter() - t0) * 1000)
+            queries.append(statements[0])
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        results[label] = {
+            'p50_ms': round(statistics.median(timings), 3),
+            'p95_ms': round(percentile(timings, 95), 3),
+            'queries': max(queries),
+            'peak_kib': round(peak / 1024, 1),
+        }
+
+    print(f"{'route':<18}{'p50 ms':>10}{'p95 ms':>10}{'queries':>9}{'peak KiB':>11}")
+    for label, r in results.items():
+        print(f"{label:<18}{r['p50_ms']:>10.2f}{r['p95_ms']:>10.2f}"
+              f"{r['queries']:>9}{r['peak_kib']:>11.1f}")
+
+    report = {
+        'params': {k: getattr(args, k) for k in
+                   ('users', 'products', 'sales', 'loans', 'days', 'seed', 'repeat', 'cold')},
+        'routes': results,
+    }
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"saved results to {args.save}")
+    if args.compare:
+        return compare(report, args.compare, args.tolerance)
+    return True
+
+
+def compare(report, baseline_path, tolerance):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    if baseline['params'] != report['params']:
+        print("WARNING: baseline was recorded with different parameters")
+    failures = []
+    for label, r in report['routes'].items():
+        base = baseline['routes'].get(label)
+        if not base:
+            continue
+        if r['p95_ms'] > base['p95_ms'] * (1 + tolerance):
+            failures.append(f"{label}: p95 {base['p95_ms']:.2f}ms -> {r['p95_ms']:.2f}ms")
+        if r['queries'] > base['queries']:
+            failures.append(f"{label}: queries {base['queries']} -> {r['queries']}")
+    for failure in failures:
+        print(f"REGRESSION: {failure}")
+    if not failures:
+        print(f"OK: no route regressed against {baseline_path}.")
+    return not failures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=3)
+    parser.add_argument('--products', type=int, default=300, help='products per user')
+    parser.add_argument('--sales', type=int, default=20, help='sales per product')
+    parser.add_argument('--loans', type=int, default=200, help='loans per user')
+    parser.add_argument('--days', type=int, default=90, help='spread dates over this many days')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--repeat', type=int, default=50, help='timed requests per route')
+    parser.add_argument('--warmup', type=int, default=5)
+    parser.add_argument('--cold', action='store_true', help='clear in-process caches before each request')
+    parser.add_argument('--routes', nargs='*', choices=[r[0] for r in ROUTES])
+    parser.add_argument('--save', metavar='JSON', help='write results to this file')
+    parser.add_argument('--compare', metavar='JSON', help='fail on regressions against this file')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed p95 growth (0.25 = 25%%)')
+    args = parser.parse_args()
+    sys.exit(0 if run(args) else 1)
@@ -0,0 +1,45 @@
+"""gunicorn settings for wsgi:app. Every value can be overridden from the environment."""
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 8000)}"
+
+# Workers spread requests across cores; threads overlap the I/O waits
+# (SQLite/Postgres round trips) inside each worker. Password hashing has its
+# own bounded pool per worker (HASH_WORKERS), so keep workers near the core
+# count rather than the usual 2n+1.
+#
+# app/security.py reads the same WEB_THREADS: at most WEB_THREADS - 1 requests per
+# worker may wait on password hashing (HASH_WORKERS running + HASH_QUEUE
+# queued), and further logins get an immediate 503. That keeps at least one
+# thread per worker free for sales during a login flood, so raise
+# WEB_THREADS through the environment rather than editing it here.
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+threads = int(os.environ.get('WEB_THREADS', 4))
+worker_class = 'gthread'
+
+# /metrics reaches one worker per scrape, so workers pool their counters in
+# METRICS_PATH (a SQLite file on local disk, instance/metrics.db by default);
+# scrape each host once and Prometheus sees the totals for all its workers.
+
+# Import the app once in the master and fork it, so workers start in
+# milliseconds and share the imported code pages.
+preload_app = True
+
+timeout = int(os.environ.get('WEB_TIMEOUT', 30))
+graceful_timeout = 30
+keepalive = 5
+# Recycle workers now and then to cap slow memory growth.
+max_requests = int(os.environ.get('WEB_MAX_REQUESTS', 2000))
+max_requests_jitter = 200
+
+accesslog = '-'
+errorlog = '-'
+
+
+def post_fork(server, worker):
+    # Never share pooled DB connections across a fork.
+    from app.extensions import db
+    from wsgi import app
+    with app.app_context():
+        db.engine.dispose(close=False)
@@ -1,7 +1,11 @@
-from app import app, db, Product, Sale
+from app import create_app
+from app.extensions import db
+from app.models import Product, Sale
+from app.schema import reconcile_stock_counters, rebuild_daily_rollup
 from datetime import date
 
 def migrate():
+    app = create_app()
     with app.app_context():
         # 1. Create the new Sale table if it doesn't exist
         db.create_all()
@@ -35,6 +39,12 @@ def migrate():
                 print(f"Skipping migration for {p.name}: {e}")
 
         db.session.commit()
+
+        # 3. The legacy column is now the running counter; rebuild it (and the
+        # revenue/profit totals) from the Sale rows so nothing is counted twice.
+        reconcile_stock_counters()
+        rebuild_daily_rollup()
+        print("Rebuilt product sales counters and daily rollup.")
         print("Migration Complete! You can now delete this script.")
 
 if __name__ == "__main__":
@@ -0,0 +1,115 @@
+"""Concurrent sale-recording stress test.
+
+Hammers /update_sales/<id> from many threads against a throwaway SQLite file
+and checks that stock never oversells and that the Product counters, the
+Sale rows and the daily rollup all agree afterwards. Prints sales/second.
+
+    python stress_sales.py --threads 16 --stock 2000 --attempts 300
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+
+def run(threads, stock, attempts, max_qty):
+    # Point the app at a scratch database *before* importing it.
+    workdir = tempfile.mkdtemp(prefix='tuckshop-stress-')
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(workdir, 'stress.db')
+    os.environ.setdefault('FLASK_SECRET_KEY', 'stress-test')
+
+    from sqlalchemy import func
+    from app import create_app
+    from app.extensions import db
+    from app.models import User, Product, Sale, DailySales
+    from app.schema import init_schema
+
+    app = create_app()
+    with app.app_context():
+        init_schema()
+        user = User(username='stress', email='stress@example.com')
+        user.set_password('stress')
+        db.session.add(user)
+        db.session.flush()
+        product = Product(name='Stress Item', quantity=stock, purchase_price=10,
+                          sale_price=15, user_id=user.id)
+        db.session.add(product)
+        db.session.commit()
+        user_id, product_id = user.id, product.id
+
+    sold_units = []
+    rejected = []
+    errors = []
+    lock = threading.Lock()
+    start_gate = threading.Barrier(threads)
+
+    def cashier(seed):
+        rng = random.Random(seed)
+        client = app.test_client()
+        with client.session_transaction() as sess:
+            sess['_user_id'] = str(user_id)
+            sess['_fresh'] = True
+        start_gate.wait()
+        for _ in range(attempts):
+            qty = rng.randint(1, max_qty)
+            resp = client.post(f'/update_sales/{product_id}', data={'items_sold': str(qty)},
+                               headers={'X-Requested-With': 'XMLHttpRequest'})
+            with lock:
+                if resp.status_code == 200:
+                    sold_units.append(qty)
+                elif resp.status_code == 400:
+                    rejected.append(qty)
+                else:
+                    errors.append((resp.status_code, resp.get_data(as_text=True)))
+
+    workers = [threading.Thread(target=cashier, args=(i,)) for i in range(threads)]
+    started = time.perf_counter()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    elapsed = time.perf_counter() - started
+
+    with app.app_context():
+        product = db.session.get(Product, product_id)
+        sale_units = db.session.query(func.coalesce(func.sum(Sale.quantity_sold), 0)).scalar()
+        sale_rows = Sale.query.count()
+        rollup_units = db.session.query(func.coalesce(func.sum(DailySales.units), 0)).scalar()
+
+    requests = threads * attempts
+    print(f"{requests} requests from {threads} threads in {elapsed:.2f}s "
+          f"({requests / elapsed:.0f} req/s, {len(sold_units) / elapsed:.0f} sales/s)")
+    print(f"accepted {len(sold_units)} sales ({sum(sold_units)} units), "
+          f"rejected {len(rejected)}, errors {len(errors)}")
+    print(f"stock {stock}: items_sold={product.items_sold} remaining={product.remaining} "
+          f"sale rows={sale_rows} sale units={sale_units} rollup units={rollup_units}")
+
+    failures = []
+    if errors:
+        failures.append(f"{len(errors)} requests failed, first: {errors[0]}")
+    if product.remaining < 0:
+        failures.append("oversold: remaining stock went negative")
+    if not (product.items_sold == sum(sold_units) == sale_units == rollup_units):
+        failures.append("counters, Sale rows and rollup disagree")
+    if sale_rows != len(sold_units):
+        failures.append("number of Sale rows does not match accepted sales")
+    if rejected and product.remaining >= max(rejected):
+        failures.append("a sale was rejected although enough stock was left at the end")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if not failures:
+        print("OK: no oversell, all totals consistent.")
+    return not failures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--stock', type=int, default=2000)
+    parser.add_argument('--attempts', type=int, default=300, help='sales attempted per thread')
+    parser.add_argument('--max-qty', type=int, default=3, help='largest quantity per sale')
+    args = parser.parse_args()
+    sys.exit(0 if run(args.threads, args.stock, args.attempts, args.max_qty) else 1)
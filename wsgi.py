@@ -0,0 +1,22 @@
+"""Production entry point.
+
+    flask --app app init-db                  # once per deploy, before starting workers
+    flask --app app build-assets             # once per deploy: hashed, compressed static files
+    gunicorn -c gunicorn.conf.py wsgi:app    # Linux/macOS
+    python wsgi.py                           # Windows (waitress)
+
+create_app() does not touch the database, so workers boot without
+re-inspecting the schema.
+"""
+import os
+
+from app import create_app
+from app.security import WEB_THREADS
+
+app = create_app()
+
+if __name__ == '__main__':
+    from waitress import serve
+
+    serve(app, host=os.environ.get('HOST', '0.0.0.0'), port=int(os.environ.get('PORT', 8000)),
+          threads=WEB_THREADS)